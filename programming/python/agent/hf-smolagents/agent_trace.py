@@ -0,0 +1,260 @@
+# Step-level tracing for the smolagents scripts.
+# instrument(agent) wraps the agent's model and tools and adds a step callback,
+# so every run records where its time went: model calls (with token counts),
+# tool calls, and the screenshot, encode and wait spans the browser helpers
+# open with span(). Traces export as JSONL or as a Chrome trace (chrome://tracing,
+# Perfetto), and a per-step breakdown is printed when agent.run returns.
+import contextlib
+import contextvars
+import functools
+import inspect
+import itertools
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+MODEL = "model"
+TOOL = "tool"
+SCREENSHOT = "screenshot"
+ENCODE = "encode"
+WAIT = "wait"
+STEP = "step"
+
+# Categories broken out in the summary; the rest of a step's time is "other".
+SUMMARY_CATEGORIES = (MODEL, TOOL, SCREENSHOT, ENCODE, WAIT)
+
+_active_run = contextvars.ContextVar("agent_trace_run", default=None)
+_span_depth = contextvars.ContextVar("agent_trace_depth", default=0)
+
+
+class _Run:
+    def __init__(self, tracer, run_id, label):
+        self.tracer = tracer
+        self.run_id = run_id
+        self.label = label
+        self.step = 0
+
+
+class Tracer:
+    """
+    Collects timed spans from one or more agent runs.
+
+    A tracer can be shared by agents running in different threads: every
+    span is tagged with the run and step it belongs to.
+    """
+
+    def __init__(self):
+        self.events = []
+        self._lock = threading.Lock()
+        self._run_ids = itertools.count(1)
+
+    def record(self, name, cat, start, dur, run=None, step=None, depth=0, **args):
+        """Adds a span that started at start (epoch seconds) and lasted dur seconds."""
+        event = {"name": name, "cat": cat, "run": run, "step": step, "start": start, "dur": dur,
+                 "depth": depth, "pid": os.getpid(), "args": args}
+        with self._lock:
+            self.events.append(event)
+
+    @contextlib.contextmanager
+    def run(self, label=""):
+        """Makes spans opened in this context (and its thread) belong to a new run of this tracer."""
+        current = _Run(self, next(self._run_ids), label)
+        token = _active_run.set(current)
+        try:
+            yield current
+        finally:
+            _active_run.reset(token)
+
+    def runs(self):
+        with self._lock:
+            return sorted({event["run"] for event in self.events if event["run"] is not None})
+
+    def summary(self, run=None):
+        """
+        Per-step time breakdown as a text table, for one run or all of them.
+
+        Concurrent spans are summed, so tool time can exceed the step total when
+        tool calls run in parallel.
+        """
+        with self._lock:
+            events = [event for event in self.events if run is None or event["run"] == run]
+        steps = {}
+        totals = defaultdict(float)
+        for event in events:
+            key = (event["run"], event["step"])
+            if event["cat"] == STEP:
+                steps.setdefault(key, defaultdict(float))["total"] += event["dur"]
+            elif event["cat"] in SUMMARY_CATEGORIES and event["depth"] == 0:
+                row = steps.setdefault(key, defaultdict(float))
+                row[event["cat"]] += event["dur"]
+                if event["cat"] == MODEL:
+                    row["tokens_in"] += event["args"].get("tokens_in") or 0
+                    row["tokens_out"] += event["args"].get("tokens_out") or 0
+        if not steps:
+            return "No steps traced."
+
+        header = ["run", "step", "total", *SUMMARY_CATEGORIES, "other", "tok in", "tok out"]
+        lines = []
+        for (run_id, step), row in sorted(steps.items(), key=lambda item: (item[0][0] or 0, item[0][1] or 0)):
+            row["other"] = max(0.0, row["total"] - sum(row[cat] for cat in SUMMARY_CATEGORIES))
+            for column, value in row.items():
+                totals[column] += value
+            lines.append(_table_row(run_id, step, row))
+        lines.append(_table_row("all", "", totals))
+        widths = [max(len(header[i]), *(len(line[i]) for line in lines)) for i in range(len(header))]
+        rendered = [header, ["-" * width for width in widths], *lines[:-1], ["-" * width for width in widths], lines[-1]]
+        return "\n".join("  ".join(cell.rjust(width) for cell, width in zip(line, widths)) for line in rendered)
+
+    def export_jsonl(self, path):
+        """Writes one JSON object per span."""
+        with self._lock:
+            events = list(self.events)
+        with open(path, "w", encoding="utf-8") as f:
+            for event in events:
+                f.write(json.dumps(event, default=str) + "\n")
+
+    def export_chrome_trace(self, path):
+        """Writes the spans in Chrome trace-event format, one track per agent run."""
+        with self._lock:
+            events = list(self.events)
+        trace = [
+            {"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": run_id, "args": {"name": f"run {run_id}"}}
+            for run_id in sorted({event["run"] or 0 for event in events})
+        ]
+        for event in events:
+            trace.append({
+                "name": event["name"],
+                "cat": event["cat"],
+                "ph": "X",
+                "ts": round(event["start"] * 1e6),
+                "dur": round(event["dur"] * 1e6),
+                "pid": event["pid"],
+                "tid": event["run"] or 0,
+                "args": {"step": event["step"], **event["args"]},
+            })
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f, default=str)
+
+    def export(self, prefix):
+        """Writes <prefix>.jsonl and <prefix>.trace.json. Returns both paths."""
+        paths = f"{prefix}.jsonl", f"{prefix}.trace.json"
+        self.export_jsonl(paths[0])
+        self.export_chrome_trace(paths[1])
+        return paths
+
+
+def _table_row(run_id, step, row):
+    cells = [str(run_id), str(step), f"{row['total']:.2f}s"]
+    cells += [f"{row[cat]:.2f}s" for cat in SUMMARY_CATEGORIES]
+    cells += [f"{row['other']:.2f}s", str(int(row["tokens_in"])), str(int(row["tokens_out"]))]
+    return cells
+
+
+@contextlib.contextmanager
+def span(name, cat, **args):
+    """
+    Times the enclosed block into the active run's trace; a no-op outside a traced run.
+
+    Yields a dict of span arguments that the block may fill in (e.g. token counts).
+    Spans opened inside another span are exported but left out of the summary, so
+    their time is not counted twice.
+    """
+    current = _active_run.get()
+    if current is None:
+        yield args
+        return
+    depth = _span_depth.get()
+    token = _span_depth.set(depth + 1)
+    start, clock = time.time(), time.perf_counter()
+    try:
+        yield args
+    finally:
+        _span_depth.reset(token)
+        current.tracer.record(name, cat, start, time.perf_counter() - clock, run=current.run_id,
+                              step=current.step, depth=depth, **args)
+
+
+class TracedModel:
+    """Model wrapper recording each call's latency and token counts; other attributes go to the wrapped model."""
+
+    def __init__(self, model):
+        self.model = model
+
+    def __call__(self, *args, **kwargs):
+        with span(getattr(self.model, "model_id", None) or type(self.model).__name__, MODEL) as info:
+            message = self.model(*args, **kwargs)
+            info["tokens_in"] = getattr(self.model, "last_input_token_count", None)
+            info["tokens_out"] = getattr(self.model, "last_output_token_count", None)
+        return message
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+
+def trace_tool(tool):
+    """Times every call of tool. Patches the instance once, so tools shared by several agents stay correct."""
+    if getattr(tool, "_traced", False):
+        return tool
+    forward = tool.forward
+
+    if inspect.iscoroutinefunction(forward):
+        @functools.wraps(forward)
+        async def traced_forward(*args, **kwargs):
+            with span(tool.name, TOOL):
+                return await forward(*args, **kwargs)
+    else:
+        @functools.wraps(forward)
+        def traced_forward(*args, **kwargs):
+            with span(tool.name, TOOL):
+                return forward(*args, **kwargs)
+
+    tool.forward = traced_forward
+    tool._traced = True
+    return tool
+
+
+def _record_step(step_log, agent):
+    current = _active_run.get()
+    if current is None:
+        return
+    # Runs last among the step callbacks, so the span also covers the ones before it (screenshots, monitor).
+    end = time.time()
+    start = step_log.start_time or end
+    args = {"error": str(step_log.error)} if step_log.error else {}
+    current.tracer.record(f"step {current.step}", STEP, start, end - start, run=current.run_id,
+                          step=current.step, **args)
+    current.step += 1
+
+
+def instrument(agent, tracer=None, summary=True):
+    """
+    Traces agent's runs into tracer (a new one by default) and returns the tracer.
+
+    The model and tools are wrapped, a step callback records each step, and
+    agent.run is wrapped to open a traced run and, if summary is set, print the
+    per-step breakdown when it returns. Streamed runs (stream=True) are not traced.
+    """
+    tracer = tracer or Tracer()
+    if not isinstance(agent.model, TracedModel):
+        agent.model = TracedModel(agent.model)
+    for tool in agent.tools.values():
+        trace_tool(tool)
+    agent.step_callbacks.append(_record_step)
+    run = agent.run
+
+    @functools.wraps(run)
+    def traced_run(task, *args, **kwargs):
+        if kwargs.get("stream"):
+            return run(task, *args, **kwargs)
+        with tracer.run(label=task[:60]) as current:
+            try:
+                return run(task, *args, **kwargs)
+            finally:
+                if summary:
+                    print(tracer.summary(current.run_id))
+
+    agent.run = traced_run
+    agent.tracer = tracer
+    return tracer
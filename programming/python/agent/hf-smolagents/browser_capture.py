@@ -0,0 +1,182 @@
+# Page-settle detection and screenshot capture for the browser agents.
+# Instead of a blind sleep before every screenshot, an async script waits for
+# the page to finish loading, go network-idle and render a frame, capped at a
+# short timeout. Screenshots are downscaled in the browser and only the last
+# few steps keep theirs, so the model never receives more than it needs.
+import base64
+from collections import deque
+from io import BytesIO
+
+from PIL import Image
+from selenium.common.exceptions import WebDriverException
+
+from smolagents.agents import ActionStep
+
+from agent_trace import ENCODE, SCREENSHOT, WAIT, span
+
+# Resolves once the document is complete, no fetch/XHR is in flight, no
+# resource finished loading and the DOM did not change for idleMs, and two
+# animation frames have been rendered. Always resolves by maxWait.
+SETTLE_SCRIPT = """
+const [maxWait, idleMs, done] = arguments;
+const start = performance.now();
+if (!window.__settle) {
+    const state = window.__settle = {inflight: 0, lastActivity: performance.now()};
+    const bump = () => { state.lastActivity = performance.now(); };
+    const origFetch = window.fetch;
+    if (origFetch) {
+        window.fetch = function () {
+            state.inflight++; bump();
+            return origFetch.apply(this, arguments).finally(() => { state.inflight--; bump(); });
+        };
+    }
+    const origSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        state.inflight++; bump();
+        this.addEventListener("loadend", () => { state.inflight--; bump(); }, {once: true});
+        return origSend.apply(this, arguments);
+    };
+    new MutationObserver(bump).observe(document, {childList: true, subtree: true, attributes: true});
+}
+const state = window.__settle;
+let resources = performance.getEntriesByType("resource").length;
+let finished = false;
+function finish(result) { if (!finished) { finished = true; done(result); } }
+function frames(result) {
+    requestAnimationFrame(() => requestAnimationFrame(() => finish(result)));
+    setTimeout(() => finish(result), 100);  // rAF is paused in hidden tabs
+}
+(function poll() {
+    const now = performance.now();
+    const count = performance.getEntriesByType("resource").length;
+    if (count !== resources) { resources = count; state.lastActivity = now; }
+    const idle = document.readyState === "complete" && state.inflight <= 0 && now - state.lastActivity >= idleMs;
+    if (idle || now - start >= maxWait) {
+        return frames({waited_ms: Math.round(now - start), settled: idle});
+    }
+    setTimeout(poll, 50);
+})();
+"""
+
+
+def wait_for_settle(driver, max_wait=2.0, idle_ms=300):
+    """
+    Waits until the page is loaded, network-idle and rendered, at most max_wait seconds.
+
+    Returns:
+        {"waited_ms": int, "settled": bool}, or None if the script could not run
+        (e.g. the page navigated away mid-wait).
+    """
+    with span("settle", WAIT) as info:
+        try:
+            settle = driver.execute_async_script(SETTLE_SCRIPT, int(max_wait * 1000), idle_ms)
+        except WebDriverException:
+            settle = None
+        info["settled"] = bool(settle and settle["settled"])
+    return settle
+
+
+def capture_screenshot(driver, max_size=(1000, 1300), quality=75):
+    """
+    Captures the viewport as a PIL image no larger than max_size.
+
+    On Chromium the screenshot is scaled down and JPEG-encoded by the browser
+    through the DevTools protocol, which is much cheaper to produce, transfer
+    and decode than a full-size PNG. Other drivers fall back to a PNG that is
+    downscaled here.
+    """
+    data = None
+    with span("capture", SCREENSHOT) as info:
+        if hasattr(driver, "execute_cdp_cmd"):
+            try:
+                viewport = driver.execute_cdp_cmd("Page.getLayoutMetrics", {})["cssVisualViewport"]
+                width, height = viewport["clientWidth"], viewport["clientHeight"]
+                scale = min(1.0, max_size[0] / width, max_size[1] / height)
+                clip = {"x": viewport["pageX"], "y": viewport["pageY"], "width": width, "height": height, "scale": scale}
+                screenshot = driver.execute_cdp_cmd(
+                    "Page.captureScreenshot", {"format": "jpeg", "quality": quality, "clip": clip}
+                )
+                data = screenshot["data"]
+            except (WebDriverException, KeyError):
+                data = None
+        info["format"] = "png" if data is None else "jpeg"
+        if data is None:
+            data = driver.get_screenshot_as_png()
+
+    with span("decode", ENCODE) as info:
+        if isinstance(data, str):
+            data = base64.b64decode(data)
+        info["bytes"] = len(data)
+        image = Image.open(BytesIO(data))
+        image.draft("RGB", max_size)  # JPEG only: decode at a reduced scale directly
+        image.load()  # decode now, so the image does not depend on the buffer
+        if image.width > max_size[0] or image.height > max_size[1]:
+            image.thumbnail(max_size)
+    return image
+
+
+class ScreenshotRing:
+    """
+    Keeps screenshots on the last keep_steps steps only.
+
+    Steps are remembered in a bounded deque; pushing a new one clears the
+    images of the step that falls off, instead of walking every step log.
+    """
+
+    def __init__(self, keep_steps=2):
+        self.keep_steps = keep_steps
+        self._steps = deque()
+
+    def push(self, step_log, images):
+        step_log.observations_images = images
+        self._steps.append(step_log)
+        while len(self._steps) > self.keep_steps:
+            self._steps.popleft().observations_images = None
+
+    def clear(self):
+        while self._steps:
+            self._steps.popleft().observations_images = None
+
+
+class ScreenshotCallback:
+    """
+    Step callback attaching a settled, downscaled screenshot and the current URL to each step.
+
+    Args:
+        get_driver: Returns the WebDriver to capture, e.g. helium.get_driver.
+        keep_steps (int, optional): Steps that keep their screenshot.
+        max_size (tuple, optional): Largest screenshot size sent to the model.
+        quality (int, optional): JPEG quality used for the browser-side capture.
+        settle_timeout (float, optional): Cap in seconds on waiting for the page to settle.
+        idle_ms (int, optional): Quiet period that counts as network/DOM idle.
+        verbose (bool, optional): Print capture details every step.
+    """
+
+    def __init__(self, get_driver, keep_steps=2, max_size=(1000, 1300), quality=75, settle_timeout=2.0,
+                 idle_ms=300, verbose=True):
+        self.get_driver = get_driver
+        self.ring = ScreenshotRing(keep_steps)
+        self.max_size = max_size
+        self.quality = quality
+        self.settle_timeout = settle_timeout
+        self.idle_ms = idle_ms
+        self.verbose = verbose
+        self._script_timeout_set = set()
+
+    def __call__(self, step_log: ActionStep, agent) -> None:
+        driver = self.get_driver()
+        if driver is None:
+            return
+        if id(driver) not in self._script_timeout_set:
+            driver.set_script_timeout(self.settle_timeout + 5)
+            self._script_timeout_set.add(id(driver))
+
+        settle = wait_for_settle(driver, self.settle_timeout, self.idle_ms)
+        image = capture_screenshot(driver, self.max_size, self.quality)
+        self.ring.push(step_log, [image])
+        if self.verbose:
+            waited = f", waited {settle['waited_ms']}ms to settle" if settle else ""
+            print(f"Captured a browser screenshot: {image.size} pixels{waited}")
+
+        url_info = f"Current url: {driver.current_url}"
+        step_log.observations = url_info if step_log.observations is None else step_log.observations + "\n" + url_info
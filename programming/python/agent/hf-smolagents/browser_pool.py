@@ -0,0 +1,227 @@
+# Headless Chrome pool for running many browsing tasks at once.
+# helium keeps its driver in a module global, so concurrent tasks run in
+# separate worker processes. Each worker starts its browser once and resets it
+# between tasks instead of cold-starting Chrome for every request, and the
+# tools and screenshot callback find the task's driver through current_driver().
+import contextlib
+import contextvars
+import functools
+import http.server
+import multiprocessing.util
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+
+import helium
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+
+WINDOW_SIZE = (1000, 1300)
+
+_current_driver = contextvars.ContextVar("browser_driver", default=None)
+
+
+def chrome_options(headless=True, window_size=WINDOW_SIZE):
+    options = webdriver.ChromeOptions()
+    options.add_argument("--force-device-scale-factor=1")
+    options.add_argument(f"--window-size={window_size[0]},{window_size[1]}")
+    options.add_argument("--disable-pdf-viewer")
+    if headless:
+        options.add_argument("--headless=new")
+        options.add_argument("--disable-gpu")
+        options.add_argument("--no-sandbox")
+        options.add_argument("--disable-dev-shm-usage")
+    return options
+
+
+def start_chrome(headless=True, window_size=WINDOW_SIZE):
+    return webdriver.Chrome(options=chrome_options(headless, window_size))
+
+
+def current_driver():
+    """Driver bound to the running task, else helium's global one."""
+    driver = _current_driver.get()
+    return driver if driver is not None else helium.get_driver()
+
+
+@contextlib.contextmanager
+def bind_driver(driver):
+    """Makes driver the one used by current_driver() and by helium commands inside the block."""
+    token = _current_driver.set(driver)
+    helium.set_driver(driver)
+    try:
+        yield driver
+    finally:
+        _current_driver.reset(token)
+
+
+def reset_driver(driver):
+    """Returns a used browser to a blank state: one tab on about:blank, no cookies or site storage."""
+    handles = driver.window_handles
+    for handle in handles[1:]:
+        driver.switch_to.window(handle)
+        driver.close()
+    driver.switch_to.window(handles[0])
+    driver.get("about:blank")
+    try:
+        driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": "*", "storageTypes": "all"})
+    except (AttributeError, WebDriverException):
+        driver.delete_all_cookies()
+
+
+class DriverPool:
+    """
+    Thread-safe pool of up to size browsers, started on first use.
+
+    A browser is reset when it is returned, and replaced when the reset
+    fails (e.g. Chrome crashed during the task).
+
+    Args:
+        size (int): Maximum number of browsers.
+        make_driver (callable, optional): Starts a browser. Defaults to headless Chrome.
+    """
+
+    def __init__(self, size, make_driver=start_chrome):
+        self.size = size
+        self.make_driver = make_driver
+        self.started = 0
+        self.restarts = 0
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Returns (driver, cold) where cold tells whether the browser was just started."""
+        try:
+            return self._idle.get_nowait(), False
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_start = self.started < self.size
+            if can_start:
+                self.started += 1
+        if can_start:
+            try:
+                return self.make_driver(), True
+            except BaseException:
+                with self._lock:
+                    self.started -= 1
+                raise
+        return self._idle.get(), False
+
+    def release(self, driver):
+        try:
+            reset_driver(driver)
+        except Exception:
+            # A dead chromedriver fails with urllib3/connection errors rather than
+            # WebDriverException; either way the browser is dropped and its slot freed.
+            try:
+                with contextlib.suppress(Exception):
+                    driver.quit()
+            finally:
+                with self._lock:
+                    self.started -= 1
+                    self.restarts += 1
+            return
+        self._idle.put(driver)
+
+    @contextlib.contextmanager
+    def driver(self):
+        """Borrows a browser bound to the current task. Yields (driver, cold)."""
+        driver, cold = self.acquire()
+        try:
+            with bind_driver(driver):
+                yield driver, cold
+        finally:
+            self.release(driver)
+
+    def close(self):
+        """Quits the idle browsers; one that fails to quit does not keep the others running."""
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            with contextlib.suppress(Exception):
+                driver.quit()
+
+
+@dataclass
+class TaskResult:
+    request: str
+    answer: object = None
+    seconds: float = 0.0
+    error: str = None
+    worker: int = None
+    cold_start: bool = False
+
+
+_worker_pool = None
+
+
+def _init_worker(headless, window_size):
+    global _worker_pool
+    _worker_pool = DriverPool(1, functools.partial(start_chrome, headless, window_size))
+    # Pool workers leave through os._exit, which skips atexit; finalizers still run.
+    multiprocessing.util.Finalize(None, _worker_pool.close, exitpriority=10)
+
+
+def _run_in_worker(run_task, request):
+    start = time.perf_counter()
+    result = TaskResult(request, worker=os.getpid())
+    try:
+        with _worker_pool.driver() as (_, cold):
+            result.cold_start = cold
+            result.answer = run_task(request)
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def run_browsing_tasks(requests, run_task, workers=4, headless=True, window_size=WINDOW_SIZE, verbose=True):
+    """
+    Runs run_task(request) for every request on a pool of worker processes, each
+    owning one browser that is reused across the tasks it runs.
+
+    run_task must be importable by the workers (a module-level function) and
+    should get its browser from current_driver() / helium.
+
+    Returns:
+        (list of TaskResult in request order, wall-clock seconds)
+    """
+    start = time.perf_counter()
+    results = [None] * len(requests)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(headless, window_size)) as pool:
+        futures = {pool.submit(_run_in_worker, run_task, request): i for i, request in enumerate(requests)}
+        for future in as_completed(futures):
+            result = results[futures[future]] = future.result()
+            if verbose:
+                status = "failed: " + result.error if result.error else "done"
+                cold = ", cold start" if result.cold_start else ""
+                print(f"[worker {result.worker}] {result.seconds:.1f}s{cold} {status}: {result.request.strip()[:60]}")
+    return results, time.perf_counter() - start
+
+
+def tasks_report(results, wall_seconds):
+    if not results:
+        return "No tasks run."
+    busy = sum(result.seconds for result in results)
+    failed = sum(result.error is not None for result in results)
+    cold = sum(result.cold_start for result in results)
+    return (f"{len(results)} tasks in {wall_seconds:.1f}s ({busy / wall_seconds:.1f}x parallelism), "
+            f"{cold} cold browser starts, {failed} failed")
+
+
+def serve_static(directory, port=0):
+    """
+    Serves directory over HTTP on localhost from a daemon thread, for testing
+    browsing tasks against local pages. Returns (server, base_url).
+    """
+    handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory=directory)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, name="static-pages", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
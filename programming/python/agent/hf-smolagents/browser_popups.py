@@ -0,0 +1,151 @@
+# Pop-up dismissal in a single WebDriver round trip.
+# All selectors are evaluated by one injected script, which clicks the visible
+# matches and reports what it closed. Selectors that closed something are
+# remembered per domain: on later visits they are tried first, and the full
+# selector list is only scanned when none of them closes anything.
+import json
+import os
+import tempfile
+import threading
+from collections import Counter, defaultdict
+
+# Common selectors for modal close buttons and overlay elements
+DEFAULT_POPUP_SELECTORS = (
+    "button[class*='close']",
+    "[class*='modal']",
+    "[class*='modal'] button",
+    "[class*='CloseButton']",
+    "[aria-label*='close']",
+    ".modal-close",
+    ".close-modal",
+    ".modal .close",
+    ".modal-backdrop",
+    ".modal-overlay",
+    "[class*='overlay']",
+)
+
+CLOSE_POPUPS_SCRIPT = """
+const [selectorsByDomain, defaultSelectors] = arguments;
+const host = location.hostname.replace(/^www\\./, "");
+const domainSelectors = selectorsByDomain[host] || [];
+const fallbackSelectors = defaultSelectors.filter(selector => !domainSelectors.includes(selector));
+function visible(el) {
+    const rect = el.getBoundingClientRect();
+    if (rect.width === 0 || rect.height === 0) return false;
+    const style = getComputedStyle(el);
+    return style.visibility !== "hidden" && style.display !== "none" && style.opacity !== "0";
+}
+const clicked = new Set();
+const bySelector = {};
+const errors = [];
+function clickAll(selectors) {
+    for (const selector of selectors) {
+        let elements;
+        try {
+            elements = document.querySelectorAll(selector);
+        } catch (e) {
+            errors.push(selector + ": " + e.message);
+            continue;
+        }
+        for (const el of elements) {
+            if (clicked.has(el) || !el.isConnected || !visible(el)) continue;
+            try {
+                el.click();
+                clicked.add(el);
+                bySelector[selector] = (bySelector[selector] || 0) + 1;
+            } catch (e) {
+                errors.push(selector + ": " + e.message);
+            }
+        }
+    }
+}
+// The domain's own selectors usually close its pop-ups; only scan everything else when they miss.
+clickAll(domainSelectors);
+const domainHit = clicked.size > 0;
+if (!domainHit) clickAll(fallbackSelectors);
+return {domain: host, closed: clicked.size, by_selector: bySelector, errors: errors, domain_hit: domainHit};
+"""
+
+
+class PopupCloser:
+    """
+    Closes visible pop-ups with one execute_script call.
+
+    Args:
+        selectors (iterable of str, optional): CSS selectors tried on every page.
+        domain_selectors (dict, optional): Extra selectors per domain (without
+            "www."), tried before the default ones.
+        learned_path (str, optional): JSON file where selectors that closed
+            something are remembered per domain across runs. Saves merge into
+            the file, so closers sharing it (other runs, other processes) keep
+            each other's counts.
+
+    A domain's configured and learned selectors are tried first; the default
+    selectors only run when none of those closes anything.
+    """
+
+    def __init__(self, selectors=DEFAULT_POPUP_SELECTORS, domain_selectors=None, learned_path=None):
+        self.selectors = list(selectors)
+        self.domain_selectors = {domain: list(values) for domain, values in (domain_selectors or {}).items()}
+        self.learned_path = learned_path
+        self.hits = defaultdict(Counter)  # domain -> selector -> elements closed
+        self._unsaved = defaultdict(Counter)  # hits not yet merged into learned_path
+        self._lock = threading.Lock()
+        for domain, counts in self._read_learned().items():
+            self.hits[domain].update(counts)
+
+    def _read_learned(self):
+        if not self.learned_path or not os.path.exists(self.learned_path):
+            return {}
+        with open(self.learned_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def selectors_by_domain(self):
+        """Per-domain selectors to try first: configured ones, then learned ones by hit count."""
+        with self._lock:
+            domains = set(self.domain_selectors) | set(self.hits)
+            return {
+                domain: self.domain_selectors.get(domain, [])
+                + [selector for selector, _ in self.hits.get(domain, Counter()).most_common()]
+                for domain in domains
+            }
+
+    def close(self, driver):
+        """Clicks visible pop-up elements. Returns the script's report (domain, closed, by_selector, errors)."""
+        report = driver.execute_script(CLOSE_POPUPS_SCRIPT, self.selectors_by_domain(), self.selectors)
+        if report["by_selector"]:
+            with self._lock:
+                self.hits[report["domain"]].update(report["by_selector"])
+                self._unsaved[report["domain"]].update(report["by_selector"])
+            self._save()
+        return report
+
+    def _save(self):
+        """Adds the unsaved hits to the counts on disk and picks up what other closers saved meanwhile."""
+        if not self.learned_path:
+            return
+        with self._lock:
+            merged = defaultdict(Counter)
+            for domain, counts in self._read_learned().items():
+                merged[domain].update(counts)
+            for domain, counts in self._unsaved.items():
+                merged[domain].update(counts)
+            directory = os.path.dirname(os.path.abspath(self.learned_path))
+            fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=".json", dir=directory)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({domain: dict(counts) for domain, counts in merged.items()}, f, indent=2)
+            os.replace(tmp_path, self.learned_path)
+            self.hits = merged
+            self._unsaved.clear()
+
+
+def describe_close_report(report):
+    """One-line summary of a PopupCloser.close report for the model."""
+    if not report["closed"]:
+        summary = "No visible pop-ups found."
+    else:
+        details = ", ".join(f"{selector} x{count}" for selector, count in report["by_selector"].items())
+        summary = f"Closed {report['closed']} element(s): {details}."
+    if report["errors"]:
+        summary += f" {len(report['errors'])} selector error(s): {'; '.join(report['errors'][:3])}"
+    return summary
@@ -0,0 +1,106 @@
+# In-page text search for the browser agents.
+# The page text is indexed once per document inside the browser and rebuilt only
+# after a DOM mutation, so repeated searches on long pages are a single cheap
+# execute_script call that counts matches and scrolls to the nth one.
+
+SEARCH_MODES = ("exact", "ignore_case", "fuzzy")
+
+# arguments: query, nth (1-based), mode. Returns
+# {count, nth, snippet, rebuilt, build_ms, search_ms, approximate} or {count: 0, ...}.
+SEARCH_SCRIPT = """
+const [query, nth, mode] = arguments;
+const t0 = performance.now();
+const fold = (s) => s.normalize("NFKD").replace(/[\\u0300-\\u036f]/g, "").replace(/\\s+/g, " ").toLowerCase();
+
+let index = window.__textIndex;
+let rebuilt = false;
+if (!index || index.dirty) {
+    // One entry per element, holding the text of its direct text nodes, in document order.
+    const byElement = new Map();
+    const walker = document.createTreeWalker(document.body || document.documentElement, NodeFilter.SHOW_TEXT, {
+        acceptNode(node) {
+            const tag = node.parentElement && node.parentElement.tagName;
+            if (tag === "SCRIPT" || tag === "STYLE" || tag === "NOSCRIPT" || !node.data.trim()) {
+                return NodeFilter.FILTER_REJECT;
+            }
+            return NodeFilter.FILTER_ACCEPT;
+        },
+    });
+    for (let node = walker.nextNode(); node; node = walker.nextNode()) {
+        const el = node.parentElement;
+        byElement.set(el, (byElement.get(el) || "") + node.data);
+    }
+    const entries = [];
+    for (const [el, text] of byElement) entries.push({el, text, lower: text.toLowerCase(), folded: null});
+    if (!index) {
+        index = window.__textIndex = {entries: [], dirty: false};
+        new MutationObserver(() => { index.dirty = true; })
+            .observe(document, {childList: true, subtree: true, characterData: true});
+    }
+    index.entries = entries;
+    index.dirty = false;
+    rebuilt = true;
+}
+const buildMs = performance.now() - t0;
+
+// Edit distance of the best match of pattern anywhere in text (Sellers), bounded by k.
+function approxContains(pattern, text, k) {
+    const m = pattern.length;
+    let prev = new Array(m + 1), cur = new Array(m + 1);
+    for (let i = 0; i <= m; i++) prev[i] = i;
+    for (let j = 1; j <= text.length; j++) {
+        cur[0] = 0;
+        const c = text.charCodeAt(j - 1);
+        for (let i = 1; i <= m; i++) {
+            const cost = pattern.charCodeAt(i - 1) === c ? 0 : 1;
+            cur[i] = Math.min(prev[i - 1] + cost, prev[i] + 1, cur[i - 1] + 1);
+        }
+        if (cur[m] <= k) return true;
+        [prev, cur] = [cur, prev];
+    }
+    return false;
+}
+
+let matches;
+let approximate = false;
+if (mode === "exact") {
+    matches = index.entries.filter((e) => e.text.includes(query));
+} else if (mode === "ignore_case") {
+    const q = query.toLowerCase();
+    matches = index.entries.filter((e) => e.lower.includes(q));
+} else {
+    const q = fold(query).trim();
+    for (const e of index.entries) if (e.folded === null) e.folded = fold(e.text);
+    matches = index.entries.filter((e) => e.folded.includes(q));
+    if (!matches.length && q.length >= 4) {
+        const k = Math.max(1, Math.floor(q.length / 4));
+        matches = index.entries.filter((e) => e.folded.length >= q.length - k && approxContains(q, e.folded, k));
+        approximate = true;
+    }
+}
+
+const result = {count: matches.length, nth, rebuilt, build_ms: buildMs, approximate, snippet: null};
+if (nth >= 1 && nth <= matches.length) {
+    const el = matches[nth - 1].el;
+    el.scrollIntoView({block: "center"});
+    result.snippet = matches[nth - 1].text.replace(/\\s+/g, " ").trim().slice(0, 200);
+}
+result.search_ms = performance.now() - t0 - buildMs;
+return result;
+"""
+
+
+def search_page(driver, text, nth=1, mode="ignore_case"):
+    """
+    Counts the elements whose text contains text and scrolls the nth into view, in one round trip.
+
+    Args:
+        driver: Selenium WebDriver.
+        text: Text to look for. Passed as a script argument, so quotes need no escaping.
+        nth: 1-based match to scroll to.
+        mode: "exact", "ignore_case" or "fuzzy" (case, accents and whitespace
+            insensitive, falling back to approximate matching).
+    """
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode {mode!r}, expected one of {', '.join(SEARCH_MODES)}")
+    return driver.execute_script(SEARCH_SCRIPT, text, nth, mode)
@@ -0,0 +1,143 @@
+# Streaming bulk loader for the tables used by text_to_sql.py.
+# Rows are read lazily from CSV / JSONL (or any iterable of dicts) and inserted
+# in chunks with executemany, one transaction per chunk.
+import csv
+import itertools
+import json
+import os
+import time
+from dataclasses import dataclass
+
+from sqlalchemy import insert
+
+# Trade durability for speed while loading. Only worth it for data that can be
+# reloaded from the source file if the machine crashes mid-load.
+BULK_LOAD_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "OFF",
+    "temp_store": "MEMORY",
+    "cache_size": -256000,  # KiB, i.e. ~256 MB of page cache
+}
+
+
+@dataclass
+class LoadStats:
+    rows: int = 0
+    chunks: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        return f"{self.rows:,} rows in {self.chunks} chunks, {self.seconds:.2f}s ({self.rows_per_second:,.0f} rows/s)"
+
+
+def iter_records(path):
+    """Yields rows of a .csv or .jsonl/.ndjson file as dicts, one line at a time."""
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, newline="", encoding="utf-8") as f:
+        if extension == ".csv":
+            yield from csv.DictReader(f)
+        elif extension in (".jsonl", ".ndjson"):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            raise ValueError(f"Unsupported input {path!r}: expected .csv, .jsonl or .ndjson")
+
+
+def _coerce_csv_values(table, records):
+    """CSV values are strings: convert them to the column types, empty cells become NULL."""
+    converters = {}
+    for column in table.columns:
+        try:
+            python_type = column.type.python_type
+        except NotImplementedError:
+            continue
+        if python_type is not str:
+            converters[column.name] = python_type
+    for record in records:
+        yield {
+            name: (None if value == "" else converters[name](value)) if name in converters else value
+            for name, value in record.items()
+        }
+
+
+def iter_chunks(records, chunk_size):
+    records = iter(records)
+    while chunk := list(itertools.islice(records, chunk_size)):
+        yield chunk
+
+
+def _set_pragmas(connection, pragmas):
+    """Applies SQLite pragmas and returns the previous values so they can be restored."""
+    previous = {}
+    for name, value in pragmas.items():
+        previous[name] = connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+        connection.exec_driver_sql(f"PRAGMA {name} = {value}")
+    connection.commit()
+    return previous
+
+
+def bulk_load(engine, table, source, chunk_size=50_000, pragmas=None, progress=True):
+    """
+    Streams rows into table with executemany, committing once per chunk.
+
+    Args:
+        engine: SQLAlchemy engine.
+        table: SQLAlchemy Table to insert into.
+        source: Path to a .csv / .jsonl file, or an iterable of row dicts.
+        chunk_size: Rows per executemany call and per transaction.
+        pragmas: SQLite pragmas applied for the duration of the load, e.g.
+            BULK_LOAD_PRAGMAS. Everything but journal_mode is restored afterwards.
+        progress: Print progress and throughput after every chunk.
+
+    Returns:
+        LoadStats for the load.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        records = iter_records(source)
+        if os.path.splitext(source)[1].lower() == ".csv":
+            records = _coerce_csv_values(table, records)
+    else:
+        records = source
+
+    # Compile the INSERT once and hand plain parameter tuples straight to the
+    # DBAPI executemany, skipping SQLAlchemy's per-row parameter processing.
+    columns = [column.name for column in table.columns]
+    statement = str(insert(table).compile(dialect=engine.dialect, column_keys=columns))
+    positional = engine.dialect.positional
+
+    stats = LoadStats()
+    start = time.perf_counter()
+    with engine.connect() as connection:
+        previous = _set_pragmas(connection, pragmas) if pragmas else {}
+        try:
+            for chunk in iter_chunks(records, chunk_size):
+                if positional:
+                    parameters = [tuple(map(record.get, columns)) for record in chunk]
+                else:
+                    parameters = [{name: record.get(name) for name in columns} for record in chunk]
+                with connection.begin():
+                    connection.exec_driver_sql(statement, parameters)
+                stats.rows += len(chunk)
+                stats.chunks += 1
+                stats.seconds = time.perf_counter() - start
+                if progress:
+                    print(f"Loaded {stats.rows:,} rows into {table.name} ({stats.rows_per_second:,.0f} rows/s)")
+        finally:
+            previous.pop("journal_mode", None)  # WAL is persistent and fine to keep
+            if previous:
+                _set_pragmas(connection, previous)
+    stats.seconds = time.perf_counter() - start
+    return stats
+
+
+def synthetic_receipts(count, start_id=1):
+    """Generates receipts rows for load testing."""
+    names = ["Alan Payne", "Alex Mason", "Woodrow Wilson", "Margaret James", "Ada Lovelace", "Grace Hopper"]
+    for i in range(start_id, start_id + count):
+        price = round(5 + (i * 7919 % 10000) / 100, 2)
+        yield {"receipt_id": i, "customer_name": names[i % len(names)], "price": price, "tip": round(price * (i % 4) / 20, 2)}
@@ -0,0 +1,146 @@
+# Record/replay cache for model completions.
+# CachedModel sits in front of any smolagents model and stores each completion
+# on disk under a hash of everything that determines it: the model, its
+# sampling parameters, the messages and the tool schemas. A recorded agent run
+# can then be replayed offline, and repeated prompts skip the network.
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from enum import Enum
+
+from smolagents.models import ChatMessage, get_dict_from_nested_dataclasses, get_tool_json_schema
+
+CACHE_MODES = ("record", "replay", "passthrough")
+
+# Model attributes that select the endpoint or the sampling, on top of model.kwargs.
+_KEY_ATTRIBUTES = ("model_id", "api_base", "provider")
+# Never part of the key: credentials must not change it, nor end up hashed next to the prompts.
+_SECRET_KWARGS = {"api_key", "token"}
+
+
+class CacheMiss(KeyError):
+    """Raised in replay mode when a completion was never recorded."""
+
+
+def _encode(value):
+    if isinstance(value, Enum):
+        return value.value
+    if hasattr(value, "__dataclass_fields__"):
+        return get_dict_from_nested_dataclasses(value)
+    if hasattr(value, "tobytes") and hasattr(value, "size"):  # PIL image: hash the pixels, not the repr
+        return {"image": hashlib.sha256(value.tobytes()).hexdigest(), "size": list(value.size), "mode": value.mode}
+    return str(value)
+
+
+def completion_key(model, messages, stop_sequences=None, grammar=None, tools_to_call_from=None, **kwargs):
+    """Hex digest identifying a completion request to model."""
+    params = {name: value for name, value in getattr(model, "kwargs", {}).items() if name not in _SECRET_KWARGS}
+    params.update((name, value) for name, value in kwargs.items() if name not in _SECRET_KWARGS)
+    request = {
+        "model": type(model).__name__,
+        **{name: getattr(model, name, None) for name in _KEY_ATTRIBUTES},
+        "params": params,
+        "messages": messages,
+        "stop_sequences": stop_sequences,
+        "grammar": grammar,
+        "tools": [get_tool_json_schema(tool) for tool in tools_to_call_from or ()],
+    }
+    payload = json.dumps(request, sort_keys=True, default=_encode, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CachedModel:
+    """
+    Model wrapper caching completions on disk.
+
+    Modes:
+        record: serve recorded completions, call the model and record the others.
+        replay: serve recorded completions only; anything else raises CacheMiss,
+            so a replayed run never reaches the network.
+        passthrough: always call the model, without reading or writing the cache.
+
+    Token counts are recorded with each completion and restored on a hit, so
+    the agent's monitor reports the same usage as the recorded run. Other
+    attributes go to the wrapped model.
+
+    Args:
+        model: The smolagents model to wrap.
+        cache_dir (str): Directory holding one JSON file per completion.
+        mode (str, optional): One of CACHE_MODES.
+    """
+
+    def __init__(self, model, cache_dir, mode="record"):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode {mode!r}, expected one of {', '.join(CACHE_MODES)}")
+        self.model = model
+        self.cache_dir = cache_dir
+        self.mode = mode
+        self.last_input_token_count = None
+        self.last_output_token_count = None
+        self.hits = self.misses = self.recorded = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, messages, stop_sequences=None, grammar=None, tools_to_call_from=None, **kwargs):
+        if self.mode == "passthrough":
+            return self._call_model(messages, stop_sequences, grammar, tools_to_call_from, **kwargs)
+
+        key = completion_key(self.model, messages, stop_sequences, grammar, tools_to_call_from, **kwargs)
+        entry = self._load(key)
+        if entry is not None:
+            with self._lock:
+                self.hits += 1
+            self.last_input_token_count = entry["input_tokens"]
+            self.last_output_token_count = entry["output_tokens"]
+            return ChatMessage.from_dict(entry["message"])
+
+        with self._lock:
+            self.misses += 1
+        if self.mode == "replay":
+            raise CacheMiss(f"No recorded completion for request {key[:12]} in {self.cache_dir} (replay mode)")
+        message = self._call_model(messages, stop_sequences, grammar, tools_to_call_from, **kwargs)
+        self._save(key, {
+            "model_id": getattr(self.model, "model_id", None),
+            "message": get_dict_from_nested_dataclasses(message),
+            "input_tokens": self.last_input_token_count,
+            "output_tokens": self.last_output_token_count,
+        })
+        with self._lock:
+            self.recorded += 1
+        return message
+
+    def _call_model(self, messages, stop_sequences, grammar, tools_to_call_from, **kwargs):
+        message = self.model(messages, stop_sequences=stop_sequences, grammar=grammar,
+                             tools_to_call_from=tools_to_call_from, **kwargs)
+        self.last_input_token_count = getattr(self.model, "last_input_token_count", None)
+        self.last_output_token_count = getattr(self.model, "last_output_token_count", None)
+        return message
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _load(self, key):
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _save(self, key, entry):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=".json", dir=os.path.dirname(path))
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(entry, f, indent=2, default=_encode, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def get_token_counts(self):
+        return {"input_token_count": self.last_input_token_count, "output_token_count": self.last_output_token_count}
+
+    def report(self):
+        return (f"LLM cache ({self.mode}, {self.cache_dir}): {self.hits} hits, {self.misses} misses, "
+                f"{self.recorded} recorded")
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
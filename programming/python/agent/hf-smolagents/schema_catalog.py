@@ -0,0 +1,221 @@
+# Lazily introspected, persisted schema catalog for the text-to-SQL tools.
+# Listing table names is cheap; columns and indexes are reflected per table on
+# first use and saved to disk under a fingerprint of the schema, so restarts
+# against an unchanged database skip reflection entirely. Row estimates change
+# with the data, not the schema, so they are recomputed instead of saved.
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+from sqlalchemy import inspect, text
+
+# Above this many tables the tool description only lists table names and the
+# agent is pointed at describe_table for the columns.
+FULL_SCHEMA_MAX_TABLES = 20
+CATALOG_VERSION = 2
+# Smallest a table row can be in a b-tree page (cell pointer and header), so
+# no database holds more than page_count * page_size / MIN_ROW_BYTES rows.
+MIN_ROW_BYTES = 4
+
+
+def schema_fingerprint(engine):
+    """Hash identifying the database schema, which changes whenever a table or index does."""
+    with engine.connect() as connection:
+        if engine.dialect.name == "sqlite":
+            rows = connection.execute(text(
+                "SELECT type, name, tbl_name, sql FROM sqlite_master ORDER BY type, name"
+            )).all()
+        else:
+            inspector = inspect(connection)
+            rows = [(name, [column["name"] for column in inspector.get_columns(name)])
+                    for name in inspector.get_table_names()]
+    payload = json.dumps([CATALOG_VERSION, engine.dialect.name, [list(row) for row in rows]], default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def estimate_rows(connection, table_name):
+    """
+    Row count estimate, usually without a table scan: the largest rowid (one
+    index lookup, current with the data), else ANALYZE statistics for WITHOUT
+    ROWID tables. None when neither is available.
+
+    The largest rowid is only an upper bound: with sparse ids it can exceed
+    what the whole database file could hold, and then the rows are counted.
+    """
+    if connection.dialect.name != "sqlite":
+        return None
+    try:
+        quoted = connection.dialect.identifier_preparer.quote(table_name)
+        largest = connection.execute(text(f"SELECT MAX(_rowid_) FROM {quoted}")).scalar() or 0
+    except Exception:
+        largest = None  # WITHOUT ROWID table or a view
+    if largest is not None:
+        page_count = connection.exec_driver_sql("PRAGMA page_count").scalar()
+        page_size = connection.exec_driver_sql("PRAGMA page_size").scalar()
+        if largest <= page_count * (page_size // MIN_ROW_BYTES):
+            return largest
+        return connection.execute(text(f"SELECT COUNT(*) FROM {quoted}")).scalar()
+    try:
+        stat = connection.execute(
+            text("SELECT stat FROM sqlite_stat1 WHERE tbl = :table AND idx IS NULL"), {"table": table_name}
+        ).scalar()
+        if stat is None:
+            stat = connection.execute(
+                text("SELECT stat FROM sqlite_stat1 WHERE tbl = :table LIMIT 1"), {"table": table_name}
+            ).scalar()
+        return int(stat.split()[0]) if stat else None
+    except Exception:
+        return None  # no sqlite_stat1 until ANALYZE has run
+
+
+class SchemaCatalog:
+    """
+    Table metadata for prompts and the describe_table tool.
+
+    Args:
+        engine: SQLAlchemy engine to introspect.
+        cache_dir (str, optional): Directory for the persisted catalog, one JSON
+            file per schema fingerprint. Nothing is persisted when None.
+        full_schema_max_tables (int, optional): Largest schema whose columns are
+            all put in the tool description.
+    """
+
+    def __init__(self, engine, cache_dir=None, full_schema_max_tables=FULL_SCHEMA_MAX_TABLES):
+        self.engine = engine
+        self.cache_dir = cache_dir
+        self.full_schema_max_tables = full_schema_max_tables
+        self.fingerprint = schema_fingerprint(engine)
+        self._tables = None
+        self._details = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    @property
+    def path(self):
+        if self.cache_dir is None:
+            return None
+        return os.path.join(self.cache_dir, f"schema-{self.fingerprint}.json")
+
+    def _load(self):
+        if self.path is None or not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            data = json.load(f)
+        self._tables = data["tables"]
+        self._details = data["details"]
+
+    def _save(self):
+        if self.path is None:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=".json", dir=self.cache_dir)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"tables": self._tables, "details": self._details}, f)
+        os.replace(tmp_path, self.path)
+
+    def table_names(self):
+        with self._lock:
+            if self._tables is None:
+                self._tables = sorted(inspect(self.engine).get_table_names())
+                self._save()
+            return list(self._tables)
+
+    def table(self, name, save=True):
+        """Columns, primary key and indexes of a table, reflected on first use."""
+        names = self.table_names()
+        if name not in names:
+            matches = [table for table in names if table.lower() == name.lower()]
+            if not matches:
+                raise KeyError(name)
+            name = matches[0]
+        with self._lock:
+            if name not in self._details:
+                self._details[name] = self._reflect(name)
+                if save:
+                    self._save()
+            return self._details[name]
+
+    def row_estimate(self, name):
+        """Current row estimate of a table, never persisted: it changes with every load."""
+        with self.engine.connect() as connection:
+            return estimate_rows(connection, self.table(name)["name"])
+
+    def _reflect(self, name):
+        with self.engine.connect() as connection:
+            inspector = inspect(connection)
+            return {
+                "name": name,
+                "columns": [
+                    {"name": column["name"], "type": str(column["type"]), "nullable": column["nullable"]}
+                    for column in inspector.get_columns(name)
+                ],
+                "primary_key": inspector.get_pk_constraint(name).get("constrained_columns") or [],
+                "foreign_keys": [
+                    {"columns": fk["constrained_columns"], "references": fk["referred_table"],
+                     "referred_columns": fk["referred_columns"]}
+                    for fk in inspector.get_foreign_keys(name)
+                ],
+                "indexes": [
+                    {"name": index["name"], "columns": index["column_names"], "unique": bool(index["unique"])}
+                    for index in inspector.get_indexes(name)
+                ],
+            }
+
+    def identifiers(self):
+        """
+        Lowercase names of the tables and of the columns reflected so far, i.e.
+        the quoted words that SQLite is known to read as identifiers.
+        """
+        names = {name.lower() for name in self.table_names()}
+        with self._lock:
+            details = list(self._details.values())
+        names.update(column["name"].lower() for table in details for column in table["columns"])
+        return names
+
+    def warm(self):
+        """Reflects every table now, e.g. before persisting a catalog for later runs."""
+        for name in self.table_names():
+            self.table(name, save=False)
+        with self._lock:
+            self._save()
+
+    def describe_table(self, name):
+        """Text description of one table for the model."""
+        try:
+            table = self.table(name)
+        except KeyError:
+            return f"No table named {name!r}. Tables: {', '.join(self.table_names())}"
+        lines = [f"Table '{table['name']}'" + self._rows_suffix(self.row_estimate(table["name"]))]
+        lines.append("Columns:")
+        for column in table["columns"]:
+            flags = []
+            if column["name"] in table["primary_key"]:
+                flags.append("primary key")
+            if not column["nullable"]:
+                flags.append("not null")
+            lines.append(f"  - {column['name']}: {column['type']}" + (f" ({', '.join(flags)})" if flags else ""))
+        for fk in table["foreign_keys"]:
+            lines.append(f"Foreign key: ({', '.join(fk['columns'])}) -> "
+                         f"{fk['references']}({', '.join(fk['referred_columns'])})")
+        for index in table["indexes"]:
+            lines.append(f"Index {index['name']}: ({', '.join(index['columns'])})"
+                         + (" unique" if index["unique"] else ""))
+        return "\n".join(lines)
+
+    @staticmethod
+    def _rows_suffix(rows):
+        return f", ~{rows:,} rows" if rows is not None else ""
+
+    def schema_summary(self):
+        """Full table descriptions for small schemas, just the table names for large ones."""
+        names = self.table_names()
+        if len(names) <= self.full_schema_max_tables:
+            return "\n\n".join(self.describe_table(name) for name in names)
+        return (f"The database has {len(names)} tables: {', '.join(names)}.\n"
+                "Call describe_table(table_name) to get the columns and indexes of a table before querying it.")
+
+    def tool_description(self, intro):
+        """Description for a SQL tool: intro followed by the schema summary."""
+        return f"{intro.strip()}\n{self.schema_summary()}"
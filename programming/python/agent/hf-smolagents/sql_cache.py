@@ -0,0 +1,240 @@
+# Result cache for the sql_engine tool.
+# Entries are keyed on normalized SQL and tagged with the tables they read, so a
+# write seen by the tool only drops the results it can have changed.
+import re
+import threading
+import time
+from collections import OrderedDict
+
+_TOKEN = re.compile(
+    r"""
+      (?P<space>\s+)
+    | (?P<comment>--[^\n]*|/\*.*?\*/)
+    | (?P<string>'(?:[^']|'')*')
+    | (?P<quoted>"(?:[^"]|"")*"|`[^`]*`|\[[^\]]*\])
+    | (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)
+    | (?P<word>[A-Za-z_][A-Za-z_0-9$]*)
+    | (?P<other>.)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+SIMPLE_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z_0-9$]*\Z")
+
+READ_STATEMENTS = {"select", "values"}
+WRITE_KEYWORDS = {"insert", "update", "delete", "replace", "create", "drop", "alter"}
+# Words that end a FROM list instead of naming a table or an alias.
+CLAUSE_KEYWORDS = {
+    "where", "group", "order", "limit", "having", "join", "inner", "left", "right", "full", "cross",
+    "natural", "on", "using", "union", "intersect", "except", "window", "set", "values", "returning",
+}
+
+
+def _number(token):
+    """Canonical spelling of a numeric literal, keeping integers and reals apart (1 / 2 != 1.0 / 2)."""
+    if re.fullmatch(r"\d+", token):
+        return str(int(token))
+    return repr(float(token))
+
+
+def sql_tokens(query, identifiers=()):
+    """
+    Splits SQL into normalized tokens: comments and whitespace dropped, keywords and
+    bare identifiers lowercased (SQLite treats them case-insensitively), numeric
+    literals canonicalized and string literals kept verbatim.
+
+    Quoted tokens are kept verbatim too: SQLite reads a double-quoted word that
+    names no column as a string literal, so "Alan" and "alan" may differ. Only
+    those naming one of identifiers (lowercase table and column names, see
+    SchemaCatalog.identifiers) are unquoted and lowercased.
+    """
+    tokens = []
+    for match in _TOKEN.finditer(query):
+        kind, token = match.lastgroup, match.group()
+        if kind in ("space", "comment"):
+            continue
+        if kind == "word":
+            token = token.lower()
+        elif kind == "quoted":
+            inner = token[1:-1]
+            if SIMPLE_IDENTIFIER.match(inner) and inner.lower() in identifiers:
+                token = inner.lower()
+        elif kind == "number":
+            token = _number(token)
+        tokens.append(token)
+    while tokens and tokens[-1] == ";":
+        tokens.pop()
+    return tokens
+
+
+def strip_comments(query):
+    """query with its comments replaced by a space and everything else (strings included) verbatim."""
+    return "".join(" " if match.lastgroup == "comment" else match.group() for match in _TOKEN.finditer(query))
+
+
+def normalize_sql(query, identifiers=()):
+    """Cache key for query: `SELECT  *\nFROM Receipts;` and `select * from receipts` are the same."""
+    return " ".join(sql_tokens(query, identifiers))
+
+
+def _identifier(token):
+    """Lowercase name a bare or quoted identifier token stands for, else None."""
+    if SIMPLE_IDENTIFIER.match(token):
+        return token
+    if len(token) > 2 and token[0] + token[-1] in ('""', "``", "[]") and SIMPLE_IDENTIFIER.match(token[1:-1]):
+        return token[1:-1].lower()
+    return None
+
+
+def _table_after(tokens, i):
+    """Table name at tokens[i], resolving `schema.table`. Returns (name, next index) or (None, i)."""
+    name = _identifier(tokens[i]) if i < len(tokens) else None
+    if name is None:
+        return None, i
+    if i + 2 < len(tokens) and tokens[i + 1] == "." and _identifier(tokens[i + 2]):
+        return _identifier(tokens[i + 2]), i + 3
+    return name, i + 1
+
+
+def _skip_if_exists(tokens, i):
+    while i < len(tokens) and tokens[i] in ("if", "not", "exists"):
+        i += 1
+    return i
+
+
+def statement_keyword(tokens):
+    """
+    Keyword naming what the statement does, looking past a leading WITH clause:
+    `WITH t AS (...) DELETE FROM ...` is a delete. Words directly followed by
+    `(` are function calls (e.g. replace()), not statement keywords.
+    """
+    if not tokens or tokens[0] != "with":
+        return tokens[0] if tokens else None
+    depth = 0
+    for i, token in enumerate(tokens[1:], 1):
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth -= 1
+        elif depth == 0 and token in READ_STATEMENTS | WRITE_KEYWORDS:
+            if i + 1 < len(tokens) and tokens[i + 1] == "(":
+                continue
+            return token
+    return None
+
+
+def is_write(tokens):
+    """True when the statement may modify the database (anything that is not a plain read)."""
+    return statement_keyword(tokens) not in READ_STATEMENTS
+
+
+def read_tables(tokens):
+    """Tables named after FROM and JOIN, including comma-separated FROM lists."""
+    tables = set()
+    for i, token in enumerate(tokens):
+        if token not in ("from", "join"):
+            continue
+        i += 1
+        while True:
+            name, i = _table_after(tokens, i)
+            if name is None:
+                break
+            tables.add(name)
+            if i < len(tokens) and tokens[i] == "as":
+                i += 1
+            if i < len(tokens) and tokens[i] not in CLAUSE_KEYWORDS and _identifier(tokens[i]):
+                i += 1  # alias
+            if token != "from" or i >= len(tokens) or tokens[i] != ",":
+                break
+            i += 1
+    return tables
+
+
+def written_tables(tokens):
+    """
+    Tables a write statement modifies. None means the statement could touch
+    anything (e.g. DROP INDEX, PRAGMA, ATTACH), so every entry must go.
+    """
+    tables = set()
+    for i, token in enumerate(tokens):
+        name = None
+        if token in ("into", "update"):
+            name, _ = _table_after(tokens, i + 1)
+        elif token == "from" and "delete" in tokens[:i]:
+            name, _ = _table_after(tokens, i + 1)
+        elif token == "table":
+            name, _ = _table_after(tokens, _skip_if_exists(tokens, i + 1))
+        elif token == "on" and "index" in tokens[:i]:
+            name, _ = _table_after(tokens, i + 1)
+        if name:
+            tables.add(name)
+    return tables or None
+
+
+class QueryCache:
+    """
+    LRU cache of query results with a TTL and per-table invalidation.
+
+    Args:
+        max_entries (int, optional): Number of results kept. Defaults to 256.
+        ttl (float, optional): Seconds a result stays valid, also bounding how
+            stale results get after writes the tool does not see (e.g. other
+            processes). None keeps entries until evicted or invalidated.
+    """
+
+    def __init__(self, max_entries=256, ttl=300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()  # key -> (expires_at, tables, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[0] is None or entry[0] > time.monotonic()):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value, tables):
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries[key] = (expires_at, frozenset(tables), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, tables=None):
+        """Drops entries reading any of tables, or everything when tables is None."""
+        with self._lock:
+            if tables is None:
+                stale = list(self._entries)
+            else:
+                tables = set(tables)
+                # Entries with no known tables (e.g. `SELECT 1`) cannot go stale.
+                stale = [key for key, (_, read, _) in self._entries.items() if read & tables]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+            return len(stale)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+    def report(self):
+        stats = self.stats()
+        return (f"Query cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%} hit rate), "
+                f"{stats['invalidations']} invalidated, {stats['entries']} entries")
@@ -0,0 +1,264 @@
+# Guard for agent-written SQL: checks the query plan before running a query,
+# bounds its run time, and keeps track of the columns queries filter and join
+# on so that missing indexes can be suggested (or created).
+import contextlib
+import re
+import time
+from collections import Counter
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import OperationalError
+
+from schema_catalog import estimate_rows
+from sql_cache import CLAUSE_KEYWORDS, SIMPLE_IDENTIFIER, is_write, read_tables, sql_tokens, strip_comments
+
+DEFAULT_MAX_SCAN_ROWS = 1_000_000
+DEFAULT_TIME_BUDGET = 10.0
+DEFAULT_AUTO_LIMIT = 1_000
+PROGRESS_HANDLER_OPS = 10_000  # SQLite VM instructions between deadline checks
+
+_PLAN_STEP = re.compile(r"^(SCAN|SEARCH) (?:TABLE )?(\S+)(?: AS (\S+))?(.*)$")
+_AGGREGATES = {"count", "sum", "avg", "min", "max", "total", "group_concat", "string_agg"}
+# A LIMIT cannot stop these early, the whole input has to be read anyway.
+_NEEDS_ALL_ROWS = {"group", "order", "distinct", "union", "intersect", "except", "having", "window"}
+_COMPARISONS = {"=", "<", ">", "!", "in", "between", "like", "glob", "is"}
+
+
+class QueryRejected(Exception):
+    """The guard refused to run a query. The message is meant for the model."""
+
+
+class QueryTimeout(QueryRejected):
+    pass
+
+
+def _top_level(tokens):
+    """Tokens outside of any parentheses."""
+    depth = 0
+    for token in tokens:
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth -= 1
+        elif depth == 0:
+            yield token
+
+
+def _table_aliases(tokens, tables):
+    """Maps aliases (and the names themselves) to the tables they stand for."""
+    aliases = {name: name for name in tables}
+    for i, token in enumerate(tokens[:-1]):
+        if token not in tables:
+            continue
+        j = i + 2 if tokens[i + 1] == "as" else i + 1
+        if j < len(tokens) and SIMPLE_IDENTIFIER.match(tokens[j]) and tokens[j] not in CLAUSE_KEYWORDS:
+            aliases[tokens[j]] = token
+    return aliases
+
+
+def full_scans(connection, query, tokens):
+    """Tables EXPLAIN QUERY PLAN reads in full, including ones it builds automatic indexes over."""
+    tables = read_tables(tokens)
+    aliases = _table_aliases(tokens, tables)
+    # The driver caches prepared statements by SQL text, and a cached EXPLAIN is
+    # not re-planned after a schema change (e.g. a new index), so tag the
+    # statement with the schema version.
+    schema_version = connection.exec_driver_sql("PRAGMA schema_version").scalar()
+    scanned = set()
+    for row in connection.execute(text(f"EXPLAIN QUERY PLAN /* schema {schema_version} */ {query}")):
+        match = _PLAN_STEP.match(row[-1])
+        if not match:
+            continue
+        kind, name, alias, rest = match.groups()
+        table = aliases.get(name) or aliases.get(alias or "")
+        if table and (kind == "SCAN" or "AUTOMATIC" in rest):
+            scanned.add(table)
+    return scanned
+
+
+def _limit_is_safe(tokens):
+    """A LIMIT only lets SQLite stop early for plain row-returning SELECTs."""
+    top = list(_top_level(tokens))
+    if not top or top[0] != "select":
+        return False
+    return not any(token in _NEEDS_ALL_ROWS or token in _AGGREGATES for token in top)
+
+
+def _own_limit(tokens):
+    """
+    Rows a query's own top-level LIMIT lets it read at most (LIMIT plus
+    OFFSET), None without a LIMIT or when it is not a plain number.
+    """
+    top = list(_top_level(tokens))
+    if "limit" not in top:
+        return None
+    clause = top[top.index("limit") + 1:]
+    if not clause or not all(token.isdigit() or token in (",", "offset") for token in clause):
+        return None
+    return sum(int(token) for token in clause if token.isdigit())
+
+
+class IndexAdvisor:
+    """
+    Counts the columns queries compare against, per table, and suggests an
+    index for those used at least min_uses times that no index starts with.
+
+    Args:
+        catalog (SchemaCatalog): Source of table columns.
+        min_uses (int, optional): Uses before a column is worth an index.
+    """
+
+    def __init__(self, catalog, min_uses=3):
+        self.catalog = catalog
+        self.min_uses = min_uses
+        self.uses = Counter()
+
+    def _columns(self, table):
+        try:
+            return {column["name"].lower() for column in self.catalog.table(table)["columns"]}
+        except KeyError:
+            return set()
+
+    def record(self, tokens):
+        """Counts columns appearing on either side of a comparison in the query."""
+        tables = read_tables(tokens)
+        aliases = _table_aliases(tokens, tables)
+        columns = {table: self._columns(table) for table in tables}
+        for i, token in enumerate(tokens):
+            if not SIMPLE_IDENTIFIER.match(token):
+                continue
+            before = tokens[i - 1] if i else ""
+            after = tokens[i + 1] if i + 1 < len(tokens) else ""
+            qualified = before == "." and i >= 2
+            if qualified:
+                before = tokens[i - 3] if i >= 3 else ""
+            if after not in _COMPARISONS and before not in ("=", "<", ">"):
+                continue
+            owners = [aliases.get(tokens[i - 2])] if qualified else list(tables)
+            for table in owners:
+                if table and token in columns.get(table, ()):
+                    self.uses[table, token] += 1
+
+    def _indexed_prefixes(self, table):
+        inspector = inspect(self.catalog.engine)
+        prefixes = {index["column_names"][0].lower() for index in inspector.get_indexes(table) if index["column_names"]}
+        pk = inspector.get_pk_constraint(table).get("constrained_columns") or []
+        if pk:
+            prefixes.add(pk[0].lower())
+        return prefixes
+
+    def suggestions(self):
+        """CREATE INDEX statements for frequently filtered, unindexed columns, most used first."""
+        statements = []
+        indexed = {}
+        for (table, column), count in self.uses.most_common():
+            if count < self.min_uses:
+                break
+            if table not in indexed:
+                indexed[table] = self._indexed_prefixes(table)
+            if column not in indexed[table]:
+                statements.append(f"CREATE INDEX IF NOT EXISTS ix_{table}_{column} ON {table} ({column})")
+        return statements
+
+    def create_indexes(self, engine):
+        """Runs the suggestions through engine (a writable one) and returns them."""
+        statements = self.suggestions()
+        with engine.begin() as connection:
+            for statement in statements:
+                connection.execute(text(statement))
+        return statements
+
+
+class QueryGuard:
+    """
+    Checks agent queries before QueryPager runs them.
+
+    Reads whose plan scans a table above max_scan_rows get a LIMIT appended
+    when that lets SQLite stop early, and are rejected otherwise. Every query
+    is cancelled through SQLite's progress handler once it has run for
+    time_budget seconds.
+
+    Args:
+        catalog (SchemaCatalog, optional): Known table and column names, used to tokenize queries.
+        max_scan_rows (int, optional): Largest table a query may scan in full.
+        time_budget (float, optional): Seconds before a query is cancelled.
+        auto_limit (int, optional): LIMIT added to unbounded scans.
+        advisor (IndexAdvisor, optional): Fed the tokens of every read.
+    """
+
+    def __init__(self, catalog=None, max_scan_rows=DEFAULT_MAX_SCAN_ROWS, time_budget=DEFAULT_TIME_BUDGET,
+                 auto_limit=DEFAULT_AUTO_LIMIT, advisor=None):
+        self.catalog = catalog
+        self.max_scan_rows = max_scan_rows
+        self.time_budget = time_budget
+        self.auto_limit = auto_limit
+        self.advisor = advisor
+        self.rewritten = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def check(self, connection, query):
+        """
+        Returns (query to run, note for the model or None).
+
+        Raises:
+            QueryRejected: The query would scan a large table and cannot be bounded.
+        """
+        tokens = sql_tokens(query, self.catalog.identifiers() if self.catalog is not None else ())
+        if is_write(tokens):
+            return query, None
+        if self.advisor is not None:
+            self.advisor.record(tokens)
+        if self.max_scan_rows is None:
+            return query, None
+
+        large = {}
+        for table in sorted(full_scans(connection, query, tokens)):
+            # Estimated on the query's own connection, so rows loaded since the catalog was built count.
+            rows = estimate_rows(connection, table)
+            if rows is not None and rows > self.max_scan_rows:
+                large[table] = rows
+        if not large:
+            return query, None
+
+        scans = ", ".join(f"{table} (~{rows:,} rows)" for table, rows in large.items())
+        limit = _own_limit(tokens)
+        if limit is not None and limit <= self.max_scan_rows and _limit_is_safe(tokens):
+            return query, None  # already bounded, SQLite stops after its own LIMIT
+        if self.auto_limit and "limit" not in _top_level(tokens) and _limit_is_safe(tokens):
+            self.rewritten += 1
+            # Comments are stripped and LIMIT goes on its own line, so a trailing `--` cannot swallow it.
+            query = strip_comments(query).strip().rstrip(";").rstrip()
+            return (f"{query}\nLIMIT {self.auto_limit}",
+                    f"Note: added LIMIT {self.auto_limit} because the query scans all of {scans}. "
+                    "Filter on indexed columns to look at specific rows.")
+        self.rejected += 1
+        raise QueryRejected(
+            f"Query rejected: it would scan all of {scans}. "
+            "Filter on indexed columns (see describe_table) or narrow the query down."
+        )
+
+    @contextlib.contextmanager
+    def time_budget_for(self, connection):
+        """Cancels statements run on connection inside the block after time_budget seconds."""
+        if not self.time_budget or connection.dialect.name != "sqlite":
+            yield
+            return
+        deadline = time.monotonic() + self.time_budget
+        dbapi_connection = connection.connection.driver_connection
+        dbapi_connection.set_progress_handler(lambda: time.monotonic() > deadline, PROGRESS_HANDLER_OPS)
+        try:
+            yield
+        except OperationalError as e:
+            if "interrupted" not in str(e.orig):
+                raise
+            self.timeouts += 1
+            raise QueryTimeout(
+                f"Query cancelled after its {self.time_budget:g}s time budget. "
+                "Filter on indexed columns or aggregate over fewer rows."
+            ) from None
+        finally:
+            dbapi_connection.set_progress_handler(None, 0)
+
+    def report(self):
+        return f"Query guard: {self.rewritten} limited, {self.rejected} rejected, {self.timeouts} timed out"
@@ -0,0 +1,226 @@
+# Bounded, paginated rendering of SQL results for agent tools.
+# Rows are pulled with fetchmany until a row or byte budget is hit, so a
+# `SELECT *` over a large table never materializes (or reaches the model) whole.
+import itertools
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from sqlalchemy import text
+
+from sql_cache import is_write, read_tables, sql_tokens, strip_comments, written_tables
+from sql_guard import QueryRejected
+
+DEFAULT_MAX_ROWS = 50
+DEFAULT_MAX_BYTES = 4_000
+DEFAULT_MAX_CELL_CHARS = 80
+FETCH_SIZE = 256
+
+
+@dataclass
+class ResultPage:
+    columns: list
+    rows: list = field(default_factory=list)
+    offset: int = 0
+    truncated: bool = False
+    total_rows: int = None
+    rowcount: int = None  # rows affected, set instead of rows for writes
+    note: str = None
+
+    @property
+    def next_offset(self):
+        return self.offset + len(self.rows)
+
+
+def _cell(value, max_chars):
+    if value is None:
+        return "NULL"
+    text_value = str(value).replace("\n", " ").replace("|", "\\|")
+    if len(text_value) > max_chars:
+        text_value = text_value[: max_chars - 1] + "…"
+    return text_value
+
+
+def _markdown_row(cells):
+    return "| " + " | ".join(cells) + " |"
+
+
+def _strip_statement(query):
+    # Comments go first: a trailing `-- ...` would swallow the `)` of the wrapping queries below.
+    return strip_comments(query).strip().rstrip(";").strip()
+
+
+def fetch_page(connection, query, offset=0, max_rows=DEFAULT_MAX_ROWS, max_bytes=DEFAULT_MAX_BYTES,
+               max_cell_chars=DEFAULT_MAX_CELL_CHARS, count_total=True):
+    """
+    Runs query and collects at most max_rows rows (and about max_bytes of rendered
+    markdown) starting at offset. Cells are already rendered to strings.
+
+    The total row count of a truncated result is computed in SQL with a
+    COUNT(*) over the query instead of draining the cursor.
+    """
+    query = _strip_statement(query)
+    statement = f"SELECT * FROM ({query}) LIMIT -1 OFFSET {int(offset)}" if offset else query
+    result = connection.execute(text(statement))
+    if not result.returns_rows:
+        return ResultPage(columns=[], rowcount=result.rowcount)
+
+    columns = list(result.keys())
+    page = ResultPage(columns=columns, offset=offset)
+    budget = max_bytes - len(_markdown_row(columns)) * 2
+    try:
+        while not page.truncated:
+            batch = result.fetchmany(min(FETCH_SIZE, max_rows - len(page.rows) + 1))
+            if not batch:
+                break
+            for row in batch:
+                cells = [_cell(value, max_cell_chars) for value in row]
+                budget -= len(_markdown_row(cells)) + 1
+                if len(page.rows) >= max_rows or (budget < 0 and page.rows):
+                    page.truncated = True
+                    break
+                page.rows.append(cells)
+    finally:
+        result.close()
+
+    if not page.truncated:
+        page.total_rows = page.next_offset
+    elif count_total:
+        page.total_rows = connection.execute(text(f"SELECT COUNT(*) FROM ({query})")).scalar()
+    return page
+
+
+def format_markdown(page):
+    lines = [_markdown_row(page.columns), _markdown_row(["---"] * len(page.columns))]
+    lines.extend(_markdown_row(cells) for cells in page.rows)
+    return "\n".join(lines)
+
+
+def format_columnar(page):
+    """One line per column, which is denser than a table for narrow results."""
+    return "\n".join(
+        f"{name}: " + ", ".join(values)
+        for name, values in itertools.zip_longest(page.columns, zip(*page.rows), fillvalue=())
+    )
+
+
+FORMATS = {"markdown": format_markdown, "columnar": format_columnar}
+
+
+def describe_page(page, fmt="markdown", cursor=None):
+    """Renders a page with a row count and, when truncated, how to get the next one."""
+    if page.rowcount is not None:
+        affected = f", {page.rowcount} row(s) affected" if page.rowcount >= 0 else ""
+        return f"Statement executed{affected}."
+    if not page.rows:
+        return "No rows." if page.offset == 0 else "No more rows."
+    first, last = page.offset + 1, page.next_offset
+    total = f"{page.total_rows:,}" if page.total_rows is not None else "?"
+    summary = f"Rows {first}-{last} of {total}."
+    if page.truncated:
+        summary += " Result truncated"
+        summary += f", call sql_next_page(cursor=\"{cursor}\") for more." if cursor else "."
+    if page.note:
+        summary += "\n" + page.note
+    return FORMATS[fmt](page) + "\n" + summary
+
+
+class QueryPager:
+    """
+    Runs queries for an agent tool and keeps cursors to continue truncated results.
+
+    A cursor remembers the query and the offset of its next page; it is resolved
+    by re-running the query with an OFFSET, so no connection is held between
+    tool calls. Only the most recent max_cursors cursors are kept.
+
+    Args:
+        engine: SQLAlchemy engine to query.
+        max_rows (int, optional): Rows per page.
+        max_bytes (int, optional): Approximate size bound of a rendered page.
+        fmt (str, optional): "markdown" or "columnar".
+        max_cursors (int, optional): Number of open cursors to remember.
+        cache (QueryCache, optional): Serves repeated reads and is invalidated by
+            writes that go through the pager.
+        guard (QueryGuard, optional): Checks the plan of every query the cache
+            cannot answer and bounds its run time.
+        catalog (SchemaCatalog, optional): Known table and column names, so that
+            quoting them does not change a query's cache key.
+    """
+
+    def __init__(self, engine, max_rows=DEFAULT_MAX_ROWS, max_bytes=DEFAULT_MAX_BYTES, fmt="markdown",
+                 max_cursors=64, cache=None, guard=None, catalog=None):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown format {fmt!r}, expected one of {', '.join(FORMATS)}")
+        self.engine = engine
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.fmt = fmt
+        self.max_cursors = max_cursors
+        self.cache = cache
+        self.guard = guard
+        self.catalog = catalog
+        self._cursors = OrderedDict()
+        self._cursor_ids = itertools.count(1)
+        self._lock = threading.Lock()  # agents in concurrent sessions share one pager
+
+    def _fetch(self, query, offset, count_total=True):
+        if self.cache is None:
+            return self._execute(query, offset, count_total)
+
+        identifiers = self.catalog.identifiers() if self.catalog is not None else ()
+        tokens = sql_tokens(query, identifiers)
+        if is_write(tokens):
+            try:
+                return self._execute(query, offset, count_total)
+            finally:
+                self.cache.invalidate(written_tables(tokens))
+
+        key = (" ".join(tokens), offset, self.max_rows, self.max_bytes)
+        page = self.cache.get(key)
+        if page is None:
+            page = self._execute(query, offset, count_total)
+            self.cache.put(key, page, read_tables(tokens))
+        return page
+
+    def _execute(self, query, offset, count_total):
+        with self.engine.connect() as connection:
+            if self.guard is None:
+                page = fetch_page(connection, query, offset, self.max_rows, self.max_bytes, count_total=count_total)
+            else:
+                query, note = self.guard.check(connection, query)
+                with self.guard.time_budget_for(connection):
+                    page = fetch_page(connection, query, offset, self.max_rows, self.max_bytes,
+                                      count_total=count_total)
+                page.note = note
+            connection.commit()  # keep writes issued through the tool
+        return page
+
+    def _render(self, query, page):
+        cursor = None
+        if page.truncated:
+            with self._lock:
+                cursor = f"c{next(self._cursor_ids)}"
+                self._cursors[cursor] = (query, page.next_offset, page.total_rows)
+                while len(self._cursors) > self.max_cursors:
+                    self._cursors.popitem(last=False)
+        return describe_page(page, self.fmt, cursor)
+
+    def run(self, query):
+        try:
+            page = self._fetch(query, 0)
+        except QueryRejected as e:
+            return str(e)
+        return self._render(query, page)
+
+    def next_page(self, cursor):
+        with self._lock:
+            entry = self._cursors.get(cursor)
+        if entry is None:
+            return f"Unknown or expired cursor {cursor!r}. Run the query again."
+        query, offset, total_rows = entry
+        try:
+            page = self._fetch(query, offset, count_total=False)
+        except QueryRejected as e:
+            return str(e)
+        page.total_rows = total_rows if page.truncated else page.next_offset
+        return self._render(query, page)
@@ -0,0 +1,99 @@
+# Concurrent agent sessions over one file-backed SQLite database.
+# The loader writes through a WAL-mode engine; the agent tools read through a
+# pool of read-only connections, so N questions can run in parallel threads
+# without serializing on a single connection or reloading the data per run.
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from sqlalchemy import create_engine, event
+
+WRITER_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",  # durable enough with WAL, and much faster than FULL
+    "busy_timeout": 5000,
+}
+READER_PRAGMAS = {
+    "query_only": 1,
+    "busy_timeout": 5000,
+    "cache_size": -64000,  # KiB per connection
+    "mmap_size": 268435456,
+}
+
+
+def _apply_pragmas_on_connect(engine, pragmas):
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, _):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+
+
+def create_writer_engine(path):
+    """Engine for loading data into the database file, in WAL mode so readers never block on it."""
+    engine = create_engine(f"sqlite:///{path}", pool_size=1, max_overflow=0)
+    _apply_pragmas_on_connect(engine, WRITER_PRAGMAS)
+    return engine
+
+
+def create_reader_engine(path, pool_size=8):
+    """
+    Pool of read-only connections to the database file, one per concurrent session.
+
+    Connections are opened with mode=ro and query_only, so statements that write
+    fail instead of taking the database write lock.
+    """
+    engine = create_engine(
+        f"sqlite:///file:{path}?mode=ro&uri=true",
+        pool_size=pool_size,
+        max_overflow=0,
+        pool_timeout=30,
+        connect_args={"check_same_thread": False},
+    )
+    _apply_pragmas_on_connect(engine, READER_PRAGMAS)
+    return engine
+
+
+@dataclass
+class SessionResult:
+    question: str
+    answer: object = None
+    seconds: float = 0.0
+    error: str = None
+
+
+def _run_session(make_agent, question):
+    start = time.perf_counter()
+    try:
+        answer = make_agent().run(question)
+        return SessionResult(question, answer, time.perf_counter() - start)
+    except Exception as e:
+        return SessionResult(question, seconds=time.perf_counter() - start, error=f"{type(e).__name__}: {e}")
+
+
+def run_sessions(questions, make_agent, workers=4):
+    """
+    Answers questions concurrently, each with its own agent from make_agent().
+
+    Agents keep per-run memory and are not shared between threads; tools (and
+    the connection pool behind them) are.
+
+    Returns:
+        (list of SessionResult in question order, wall-clock seconds)
+    """
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="agent-session") as executor:
+        results = list(executor.map(lambda question: _run_session(make_agent, question), questions))
+    return results, time.perf_counter() - start
+
+
+def throughput_report(results, wall_seconds):
+    latencies = sorted(result.seconds for result in results)
+    errors = sum(result.error is not None for result in results)
+    if not latencies:
+        return "No sessions run."
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    return (f"{len(results)} questions in {wall_seconds:.1f}s ({len(results) / wall_seconds:.2f} questions/s), "
+            f"latency median {statistics.median(latencies):.1f}s p95 {p95:.1f}s, {errors} failed")
@@ -0,0 +1,74 @@
+import pytest
+from sqlalchemy import create_engine, text
+
+from schema_catalog import SchemaCatalog, estimate_rows
+from sql_guard import QueryGuard, QueryRejected
+from sql_results import QueryPager
+
+
+def _engine(rows):
+    engine = create_engine("sqlite:///:memory:")
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE receipts (receipt_id INTEGER PRIMARY KEY, customer_name TEXT, price REAL)"))
+        _insert(connection, 0, rows)
+    return engine
+
+
+def _insert(connection, start, rows):
+    connection.execute(
+        text("INSERT INTO receipts VALUES (:id, :name, :price)"),
+        [{"id": i, "name": f"customer {i}", "price": i / 10} for i in range(start + 1, start + rows + 1)],
+    )
+
+
+def test_auto_limit_survives_trailing_comment():
+    engine = _engine(50)
+    guard = QueryGuard(max_scan_rows=10, auto_limit=5)
+    with engine.connect() as connection:
+        query, note = guard.check(connection, "SELECT * FROM receipts -- every receipt")
+        rows = connection.execute(text(query)).all()
+    assert note and "LIMIT 5" in note
+    assert len(rows) == 5
+
+
+def test_pager_runs_limited_commented_query():
+    engine = _engine(50)
+    pager = QueryPager(engine, max_rows=100, guard=QueryGuard(max_scan_rows=10, auto_limit=5))
+    result = pager.run("SELECT customer_name FROM receipts; -- all names")
+    assert "Rows 1-5 of 5." in result
+
+
+def test_scan_check_sees_rows_loaded_after_catalog_was_cached(tmp_path):
+    engine = _engine(2)
+    SchemaCatalog(engine, cache_dir=str(tmp_path)).warm()
+    with engine.begin() as connection:
+        _insert(connection, 2, 300)
+
+    catalog = SchemaCatalog(engine, cache_dir=str(tmp_path))  # same schema: loaded from disk
+    assert catalog.table("receipts")  # reflected from the persisted catalog
+    guard = QueryGuard(catalog, max_scan_rows=100)
+    with engine.connect() as connection:
+        with pytest.raises(QueryRejected):
+            guard.check(connection, "SELECT SUM(price) FROM receipts")
+    assert "~302 rows" in catalog.describe_table("receipts")
+
+
+def test_query_with_its_own_limit_runs_unchanged():
+    engine = _engine(50)
+    guard = QueryGuard(max_scan_rows=10, auto_limit=5)
+    with engine.connect() as connection:
+        assert guard.check(connection, "SELECT * FROM receipts LIMIT 3") == ("SELECT * FROM receipts LIMIT 3", None)
+        with pytest.raises(QueryRejected):
+            guard.check(connection, "SELECT * FROM receipts LIMIT 5 OFFSET 40")
+        with pytest.raises(QueryRejected):
+            guard.check(connection, "SELECT * FROM receipts ORDER BY price LIMIT 3")
+
+
+def test_sparse_rowids_do_not_inflate_the_row_estimate():
+    engine = _engine(1)
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO receipts VALUES (20240101001, 'a', 1), (20240101002, 'b', 2)"))
+    guard = QueryGuard(max_scan_rows=100)
+    with engine.connect() as connection:
+        assert estimate_rows(connection, "receipts") == 3
+        assert guard.check(connection, "SELECT customer_name FROM receipts ORDER BY price")[1] is None
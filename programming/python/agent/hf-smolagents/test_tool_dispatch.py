@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+from smolagents import tool
+from smolagents.agents import ToolCall
+from smolagents.utils import AgentExecutionError
+
+from tool_dispatch import ParallelToolCallingAgent
+
+
+@tool
+def to_int(x: str) -> int:
+    """
+    Converts a string to an integer.
+
+    Args:
+        x: The string to convert.
+    """
+    return int(x)
+
+
+@tool
+def echo(text: str) -> str:
+    """
+    Returns text unchanged.
+
+    Args:
+        text: The text to return.
+    """
+
+
+async def _echo(text):
+    await asyncio.sleep(0)
+    return text
+
+
+echo.forward = _echo
+
+
+def _agent():
+    return ParallelToolCallingAgent(tools=[to_int, echo], model=lambda *args, **kwargs: None, verbosity_level=0)
+
+
+@pytest.mark.parametrize("calls", [
+    [ToolCall(name="to_int", arguments={"x": "$1"}, id="call_1")],
+    [ToolCall(name="to_int", arguments={"x": "call_1"}, id="call_1")],
+    [ToolCall(name="final_answer", arguments={"answer": "42"}, id="call_1"),
+     ToolCall(name="to_int", arguments={"x": "$1"}, id="call_2")],
+])
+def test_references_without_a_result_are_execution_errors(calls):
+    with pytest.raises(AgentExecutionError):
+        _agent().dispatch(calls)
+
+
+def test_async_level_runs_inside_a_running_event_loop():
+    agent = _agent()
+    calls = [ToolCall(name="echo", arguments={"text": "a"}, id="call_1"),
+             ToolCall(name="echo", arguments={"text": "b"}, id="call_2")]
+
+    async def main():
+        return agent.dispatch(calls)
+
+    assert asyncio.run(main()) == {0: "a", 1: "b"}
@@ -8,12 +8,58 @@ from sqlalchemy import (
     String,
     Integer,
     Float,
+    func,
     insert,
-    inspect,
-    text,
+    select,
 )
+import argparse
 
-engine = create_engine("sqlite:///:memory:")
+from agent_trace import Tracer, instrument
+from bulk_load import BULK_LOAD_PRAGMAS, bulk_load
+from schema_catalog import SchemaCatalog
+from sql_cache import QueryCache
+from sql_guard import DEFAULT_MAX_SCAN_ROWS, DEFAULT_TIME_BUDGET, IndexAdvisor, QueryGuard
+from sql_results import DEFAULT_MAX_BYTES, DEFAULT_MAX_ROWS, FORMATS, QueryPager
+from sql_sessions import create_reader_engine, create_writer_engine, run_sessions, throughput_report
+
+parser = argparse.ArgumentParser(description="Ask an agent questions about a receipts table.")
+parser.add_argument("--db", default=":memory:", help="SQLite database file (default: in-memory)")
+parser.add_argument("--load", default=None, help="CSV or JSONL file of receipts to stream into the table")
+parser.add_argument("--chunk-size", type=int, default=50_000, help="Rows per executemany batch (default: 50000)")
+parser.add_argument("--fast-pragmas", action="store_true",
+                    help="Relax SQLite durability (WAL, synchronous=OFF) while loading")
+parser.add_argument("--max-rows", type=int, default=DEFAULT_MAX_ROWS, help="Rows per sql_engine result page")
+parser.add_argument("--max-bytes", type=int, default=DEFAULT_MAX_BYTES,
+                    help="Approximate size bound of a sql_engine result page")
+parser.add_argument("--result-format", choices=sorted(FORMATS), default="markdown",
+                    help="How sql_engine renders rows (default: markdown)")
+parser.add_argument("--cache-ttl", type=float, default=300.0,
+                    help="Seconds a cached sql_engine result stays valid (default: 300)")
+parser.add_argument("--no-query-cache", action="store_true", help="Run every sql_engine query against the database")
+parser.add_argument("--schema-cache", default=None,
+                    help="Directory to persist the reflected schema in, keyed by a schema fingerprint")
+parser.add_argument("--no-guard", action="store_true", help="Run agent queries without the query plan guard")
+parser.add_argument("--max-scan-rows", type=int, default=DEFAULT_MAX_SCAN_ROWS,
+                    help="Largest table an agent query may scan in full (default: %(default)s)")
+parser.add_argument("--query-timeout", type=float, default=DEFAULT_TIME_BUDGET,
+                    help="Seconds before an agent query is cancelled (default: %(default)s)")
+parser.add_argument("--create-indexes", action="store_true",
+                    help="Create the indexes the advisor suggests after the run instead of just printing them")
+parser.add_argument("--questions", default=None, help="File with one question per line to answer")
+parser.add_argument("-j", "--concurrency", type=int, default=1,
+                    help="Questions answered in parallel, each by its own agent (needs a --db file)")
+parser.add_argument("--trace", default=None, metavar="PREFIX",
+                    help="Write the run's trace to PREFIX.jsonl and PREFIX.trace.json (Chrome trace format)")
+args = parser.parse_args()
+
+if args.db == ":memory:":
+    if args.concurrency > 1:
+        parser.error("--concurrency needs a file-backed --db: every pooled connection would get its own empty in-memory database")
+    engine = read_engine = create_engine("sqlite:///:memory:")
+else:
+    # Load through a WAL-mode writer, query through a pool of read-only connections.
+    engine = create_writer_engine(args.db)
+    read_engine = create_reader_engine(args.db, pool_size=max(args.concurrency, 1))
 metadata_obj = MetaData()
 
 # create city SQL table
@@ -34,45 +80,98 @@ rows = [
     {"receipt_id": 3, "customer_name": "Woodrow Wilson", "price": 53.43, "tip": 5.43},
     {"receipt_id": 4, "customer_name": "Margaret James", "price": 21.11, "tip": 1.00},
 ]
-for row in rows:
-    stmt = insert(receipts).values(**row)
+if args.load:
+    stats = bulk_load(engine, receipts, args.load, chunk_size=args.chunk_size,
+                      pragmas=BULK_LOAD_PRAGMAS if args.fast_pragmas else None)
+    print(stats)
+else:
     with engine.begin() as connection:
-        cursor = connection.execute(stmt)
-
-inspector = inspect(engine)
-columns_info = [(col["name"], col["type"]) for col in inspector.get_columns("receipts")]
+        if connection.execute(select(func.count()).select_from(receipts)).scalar() == 0:
+            connection.execute(insert(receipts), rows)
 
-table_description = "Columns:\n" + "\n".join([f"  - {name}: {col_type}" for name, col_type in columns_info])
-print(table_description)
+catalog = SchemaCatalog(read_engine, cache_dir=args.schema_cache)
+print(catalog.schema_summary())
 
 from smolagents import tool
 
+query_cache = None if args.no_query_cache else QueryCache(ttl=args.cache_ttl)
+advisor = guard = None
+if not args.no_guard:
+    advisor = IndexAdvisor(catalog)
+    guard = QueryGuard(catalog, max_scan_rows=args.max_scan_rows, time_budget=args.query_timeout, advisor=advisor)
+pager = QueryPager(read_engine, max_rows=args.max_rows, max_bytes=args.max_bytes, fmt=args.result_format,
+                   cache=query_cache, guard=guard, catalog=catalog)
+
 @tool
 def sql_engine(query: str) -> str:
     """
-    Allows you to perform SQL queries on the table. Returns a string representation of the result.
-    The table is named 'receipts'. Its description is as follows:
-        Columns:
-        - receipt_id: INTEGER
-        - customer_name: VARCHAR(16)
-        - price: FLOAT
-        - tip: FLOAT
+    Allows you to perform SQL queries on the database. Returns the rows as a table with the total row count.
+    Large results are truncated; use sql_next_page with the returned cursor to read further.
 
     Args:
         query: The query to perform. This should be correct SQL.
     """
-    output = ""
-    with engine.connect() as con:
-        rows = con.execute(text(query))
-        for row in rows:
-            output += "\n" + str(row)
-    return output
+    return pager.run(query)
+
+sql_engine.description = catalog.tool_description(sql_engine.description)
+
+@tool
+def describe_table(table_name: str) -> str:
+    """
+    Returns the columns, keys, indexes and approximate row count of a table.
+
+    Args:
+        table_name: Name of the table to describe.
+    """
+    return catalog.describe_table(table_name)
+
+@tool
+def sql_next_page(cursor: str) -> str:
+    """
+    Returns the next page of a truncated sql_engine result.
+
+    Args:
+        cursor: The cursor given at the end of the truncated result, e.g. "c1".
+    """
+    return pager.next_page(cursor)
 
 from smolagents import CodeAgent, HfApiModel
 
-agent = CodeAgent(
-    tools=[sql_engine],
-    model=HfApiModel(),
-    # model=HfApiModel("meta-llama/Meta-Llama-3.1-8B-Instruct"),
-)
-agent.run("Can you give me the name of the client who got the most expensive receipt?")
\ No newline at end of file
+tracer = Tracer()
+
+def make_agent():
+    agent = CodeAgent(
+        tools=[sql_engine, sql_next_page, describe_table],
+        model=HfApiModel(),
+        # model=HfApiModel("meta-llama/Meta-Llama-3.1-8B-Instruct"),
+    )
+    # Concurrent sessions share the tracer; their breakdown is printed once at the end.
+    instrument(agent, tracer, summary=args.concurrency == 1)
+    return agent
+
+questions = ["Can you give me the name of the client who got the most expensive receipt?"]
+if args.questions:
+    with open(args.questions, encoding="utf-8") as f:
+        questions = [line.strip() for line in f if line.strip()]
+
+if len(questions) == 1:
+    make_agent().run(questions[0])
+else:
+    results, wall_seconds = run_sessions(questions, make_agent, workers=args.concurrency)
+    for result in results:
+        print(f"Q: {result.question}\nA: {result.error or result.answer}\n")
+    print(throughput_report(results, wall_seconds))
+    if args.concurrency > 1:
+        print(tracer.summary())
+if args.trace:
+    print("Trace written to " + " and ".join(tracer.export(args.trace)))
+if query_cache is not None:
+    print(query_cache.report())
+if guard is not None:
+    print(guard.report())
+    if args.create_indexes:
+        for statement in advisor.create_indexes(engine):
+            print(f"Created: {statement}")
+    else:
+        for statement in advisor.suggestions():
+            print(f"Suggested index: {statement}")
\ No newline at end of file
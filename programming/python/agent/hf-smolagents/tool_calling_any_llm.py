@@ -1,6 +1,20 @@
 from smolagents.agents import ToolCallingAgent
 from smolagents import tool, HfApiModel, TransformersModel, LiteLLMModel
 from typing import Optional
+import argparse
+
+from agent_trace import instrument
+from llm_cache import CACHE_MODES, CachedModel
+
+parser = argparse.ArgumentParser(description="Run a tool-calling agent.")
+parser.add_argument("--trace", default=None, metavar="PREFIX",
+                    help="Write the run's trace to PREFIX.jsonl and PREFIX.trace.json (Chrome trace format)")
+parser.add_argument("--llm-cache", default="llm_cache", metavar="DIR",
+                    help="Directory of recorded model completions (default: %(default)s)")
+parser.add_argument("--llm-cache-mode", choices=CACHE_MODES, default="passthrough",
+                    help="record: reuse recorded completions and record new ones; replay: run offline from "
+                         "recorded completions only; passthrough: always call the model (default)")
+args = parser.parse_args()
 
 # Choose which LLM engine to use!
 # model = HfApiModel(model_id="meta-llama/Llama-3.3-70B-Instruct")
@@ -23,6 +37,15 @@ def get_weather(location: str, celsius: Optional[bool] = False) -> str:
     """
     return "The weather is UNGODLY with torrential rains and temperatures below -10°C"
 
+# Identical requests are answered from disk in record/replay mode.
+model = CachedModel(model, args.llm_cache, mode=args.llm_cache_mode)
+
 agent = ToolCallingAgent(tools=[get_weather], model=model)
+# Prints a per-step breakdown (model latency, tokens, tool time) after each run.
+tracer = instrument(agent)
 
-print(agent.run("What's the weather like in Paris?"))
\ No newline at end of file
+print(agent.run("What's the weather like in Paris?"))
+if args.llm_cache_mode != "passthrough":
+    print(model.report())
+if args.trace:
+    print("Trace written to " + " and ".join(tracer.export(args.trace)))
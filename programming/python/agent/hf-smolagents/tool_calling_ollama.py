@@ -1,6 +1,20 @@
-from smolagents.agents import ToolCallingAgent
 from smolagents import tool, LiteLLMModel
 from typing import Optional
+import argparse
+
+from agent_trace import instrument
+from llm_cache import CACHE_MODES, CachedModel
+from tool_dispatch import ParallelToolCallingAgent, pure
+
+parser = argparse.ArgumentParser(description="Run a tool-calling agent.")
+parser.add_argument("--trace", default=None, metavar="PREFIX",
+                    help="Write the run's trace to PREFIX.jsonl and PREFIX.trace.json (Chrome trace format)")
+parser.add_argument("--llm-cache", default="llm_cache", metavar="DIR",
+                    help="Directory of recorded model completions (default: %(default)s)")
+parser.add_argument("--llm-cache-mode", choices=CACHE_MODES, default="passthrough",
+                    help="record: reuse recorded completions and record new ones; replay: run offline from "
+                         "recorded completions only; passthrough: always call the model (default)")
+args = parser.parse_args()
 
 model = LiteLLMModel(
     model_id="ollama_chat/llama3.2",
@@ -20,6 +34,7 @@ def get_weather(location: str, celsius: Optional[bool] = False) -> str:
     """
     return "The weather is UNGODLY with torrential rains and temperatures below -10°C"
 
+@pure
 @tool
 def addition(x: int, y: int) -> int:
     """
@@ -32,6 +47,7 @@ def addition(x: int, y: int) -> int:
     """
     return x + y
 
+@pure
 @tool
 def to_int(x: str) -> int:
     """
@@ -42,8 +58,18 @@ def to_int(x: str) -> int:
     """
     return int(x)
 
-agent = ToolCallingAgent(tools=[get_weather, to_int, addition], model=model)
+# Identical requests are answered from disk in record/replay mode.
+model = CachedModel(model, args.llm_cache, mode=args.llm_cache_mode)
+
+# Runs all the tool calls of a step, e.g. both to_int calls at once, then addition on their results.
+agent = ParallelToolCallingAgent(tools=[get_weather, to_int, addition], model=model)
+# Prints a per-step breakdown (model latency, tokens, tool time) after each run.
+tracer = instrument(agent)
 
 # print(agent.run("What's the weather like in Paris?"))
 
-print(agent.run("what is the sum of 40 and 2?"))
\ No newline at end of file
+print(agent.run("what is the sum of 40 and 2?"))
+if args.llm_cache_mode != "passthrough":
+    print(model.report())
+if args.trace:
+    print("Trace written to " + " and ".join(tracer.export(args.trace)))
@@ -0,0 +1,326 @@
+# Parallel dispatch of the tool calls a model emits in one step.
+# ToolCallingAgent only runs the first tool call of each step. ParallelToolCallingAgent
+# runs all of them: calls that do not use each other's results run concurrently
+# (on a thread pool, or gathered on an event loop for async tools), and the
+# observations are merged back in call order. Tools marked pure are memoized
+# for the rest of the run.
+import asyncio
+import contextvars
+import inspect
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from rich.panel import Panel
+from rich.text import Text
+
+from smolagents.agents import ToolCall, ToolCallingAgent
+from smolagents.tools import get_tool_description_with_args
+from smolagents.types import AgentAudio, AgentImage, handle_agent_input_types, handle_agent_output_types
+from smolagents.utils import AgentExecutionError, AgentGenerationError, LogLevel
+
+# An argument equal to "$N" takes the result of the step's Nth call (1-based).
+_REFERENCE = re.compile(r"^\$(\d+)$")
+
+PARALLEL_CALLS_PROMPT = """
+You can make several tool calls in a single step: calls that do not depend on each other run at the same time.
+To pass the result of an earlier call of the same step to another call, use "$N" as the argument value, where N is
+the 1-based position of that call in the step. For example, call to_int(x="40"), to_int(x="2") and then
+addition(x="$1", y="$2") in one step.
+"""
+
+
+def pure(tool):
+    """Marks tool as pure: the same arguments always give the same result, without side effects."""
+    tool.pure = True
+    return tool
+
+
+def is_pure(tool):
+    return getattr(tool, "pure", False)
+
+
+def is_async_tool(tool):
+    return inspect.iscoroutinefunction(inspect.unwrap(tool.forward))
+
+
+async def call_async_tool(tool, *args, sanitize_inputs_outputs=False, **kwargs):
+    """
+    Awaitable Tool.__call__ for tools with an async forward: the same setup,
+    single-dict arguments and input/output sanitization (AgentImage, AgentText, ...).
+    """
+    if not tool.is_initialized:
+        tool.setup()
+    if len(args) == 1 and not kwargs and isinstance(args[0], dict) and all(key in tool.inputs for key in args[0]):
+        args, kwargs = (), args[0]
+    if sanitize_inputs_outputs:
+        args, kwargs = handle_agent_input_types(*args, **kwargs)
+    outputs = await tool.forward(*args, **kwargs)
+    if sanitize_inputs_outputs:
+        outputs = handle_agent_output_types(outputs, tool.output_type)
+    return outputs
+
+
+def _walk(value):
+    if isinstance(value, dict):
+        for item in value.values():
+            yield from _walk(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from _walk(item)
+    else:
+        yield value
+
+
+def _reference(value, tool_calls):
+    """Index of the call value refers to, by "$N" or by call id, else None."""
+    if not isinstance(value, str):
+        return None
+    match = _REFERENCE.match(value)
+    if match and 1 <= int(match.group(1)) <= len(tool_calls):
+        return int(match.group(1)) - 1
+    for i, call in enumerate(tool_calls):
+        if call.id and value == call.id:
+            return i
+    return None
+
+
+def call_dependencies(tool_calls):
+    """For each call, the set of indices of the calls whose results its arguments use."""
+    dependencies = []
+    for i, call in enumerate(tool_calls):
+        referenced = {_reference(value, tool_calls) for value in _walk(call.arguments)}
+        dependencies.append({j for j in referenced if j is not None and j != i})
+    return dependencies
+
+
+def check_references(tool_calls):
+    """
+    Raises ValueError for references that can never have a result: a call
+    referring to itself, or to the final_answer call, which is not run.
+    """
+    for i, call in enumerate(tool_calls):
+        for value in _walk(call.arguments):
+            j = _reference(value, tool_calls)
+            if j == i:
+                raise ValueError(f"Tool call {i + 1} ({call.name}) uses its own result {value!r}")
+            if j is not None and tool_calls[j].name == "final_answer":
+                raise ValueError(f"Tool call {i + 1} ({call.name}) uses {value!r}, the final_answer call, "
+                                 "which has no result")
+
+
+def dependency_levels(dependencies):
+    """
+    Groups call indices into levels that can run concurrently, each level only
+    depending on earlier ones. Raises ValueError on a dependency cycle.
+    """
+    remaining = {i: set(deps) for i, deps in enumerate(dependencies)}
+    levels = []
+    while remaining:
+        ready = sorted(i for i, deps in remaining.items() if not deps)
+        if not ready:
+            raise ValueError(f"Tool calls {sorted(i + 1 for i in remaining)} depend on each other in a cycle")
+        levels.append(ready)
+        for i in ready:
+            del remaining[i]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+    return levels
+
+
+def resolve_arguments(arguments, results, tool_calls):
+    """Copy of arguments with references to other calls replaced by their results."""
+    if isinstance(arguments, dict):
+        return {key: resolve_arguments(value, results, tool_calls) for key, value in arguments.items()}
+    if isinstance(arguments, list):
+        return [resolve_arguments(value, results, tool_calls) for value in arguments]
+    index = _reference(arguments, tool_calls)
+    return results[index] if index is not None else arguments
+
+
+class ParallelToolCallingAgent(ToolCallingAgent):
+    """
+    ToolCallingAgent running every tool call of a step, independent ones concurrently.
+
+    Calls are scheduled by level of the dependency graph built from their
+    arguments ("$N" or a call id refers to another call's result). Sync tools
+    run on a thread pool; async tools (with an async forward) are gathered on
+    one event loop. Results of tools marked with pure() are memoized per run.
+
+    Args:
+        max_workers (int, optional): Threads running tool calls of one level at once.
+        **kwargs: Passed to ToolCallingAgent.
+    """
+
+    def __init__(self, *args, max_workers=8, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_workers = max_workers
+        self.memo = {}
+        self.memo_hits = 0
+
+    def initialize_system_prompt(self):
+        super().initialize_system_prompt()
+        self.system_prompt += PARALLEL_CALLS_PROMPT
+        return self.system_prompt
+
+    def run(self, task, *args, reset=True, **kwargs):
+        if reset:
+            self.memo = {}
+            self.memo_hits = 0
+        return super().run(task, *args, reset=reset, **kwargs)
+
+    # Copy of ToolCallingAgent.step from smolagents 1.5 (pinned <1.6 in pyproject.toml), with
+    # dispatch() in place of its single execute_tool_call. Re-sync it when upgrading smolagents.
+    def step(self, log_entry):
+        agent_memory = self.write_inner_memory_from_logs()
+        self.input_messages = agent_memory
+        log_entry.agent_memory = agent_memory.copy()
+
+        try:
+            model_message = self.model(
+                self.input_messages,
+                tools_to_call_from=list(self.tools.values()),
+                stop_sequences=["Observation:"],
+            )
+            if model_message.tool_calls is None or len(model_message.tool_calls) == 0:
+                raise Exception("Model did not call any tools. Call `final_answer` tool to return a final answer.")
+        except Exception as e:
+            raise AgentGenerationError(f"Error in generating tool call with model:\n{e}", self.logger)
+
+        tool_calls = [
+            ToolCall(name=call.function.name, arguments=call.function.arguments, id=call.id)
+            for call in model_message.tool_calls
+        ]
+        log_entry.tool_calls = tool_calls
+        self.logger.log(
+            Panel(Text("\n".join(f"Calling tool: '{call.name}' with arguments: {call.arguments}" for call in tool_calls))),
+            level=LogLevel.INFO,
+        )
+
+        results = self.dispatch(tool_calls)
+        final = next((i for i, call in enumerate(tool_calls) if call.name == "final_answer"), None)
+        if final is not None:
+            answer = resolve_arguments(tool_calls[final].arguments, results, tool_calls)
+            if isinstance(answer, dict) and "answer" in answer:
+                answer = answer["answer"]
+            if isinstance(answer, str) and answer in self.state:
+                answer = self.state[answer]
+            self.logger.log(Text(f"Final answer: {answer}"), level=LogLevel.INFO)
+            log_entry.action_output = answer
+            return answer
+
+        observations = [self._observation_text(results[i]) for i in range(len(tool_calls))]
+        if len(tool_calls) == 1:
+            log_entry.observations = observations[0]
+        else:
+            log_entry.observations = "\n".join(
+                f"${i + 1} {call.name}: {text}" for i, (call, text) in enumerate(zip(tool_calls, observations))
+            )
+        self.logger.log(f"Observations: {log_entry.observations.replace('[', '|')}", level=LogLevel.INFO)
+        return None
+
+    def dispatch(self, tool_calls):
+        """Runs every call but final_answer, level by level. Returns the results by call index."""
+        try:
+            check_references(tool_calls)
+            levels = dependency_levels(call_dependencies(tool_calls))
+        except ValueError as e:
+            raise AgentExecutionError(str(e), self.logger)
+        results = {}
+        for level in levels:
+            pending = {}  # memo key -> indices waiting for that call
+            for i in level:
+                call = tool_calls[i]
+                if call.name == "final_answer":
+                    continue
+                arguments = resolve_arguments(call.arguments or {}, results, tool_calls)
+                key = self._memo_key(call.name, arguments)
+                if key is not None and key in self.memo:
+                    results[i] = self.memo[key]
+                    self.memo_hits += 1
+                elif key is not None and key in pending:
+                    pending[key][1].append(i)  # identical pure call in the same level: run it once
+                else:
+                    pending[key if key is not None else ("call", i)] = ((call.name, arguments), [i])
+            if not pending:
+                continue
+            outcomes = self._run_level([request for request, _ in pending.values()])
+            for (key, (_, indices)), outcome in zip(pending.items(), outcomes):
+                if isinstance(outcome, Exception):
+                    raise outcome
+                for i in indices:
+                    results[i] = outcome
+                if key[0] != "call":
+                    self.memo[key] = outcome
+        return results
+
+    def _memo_key(self, name, arguments):
+        tool = self.tools.get(name)
+        if tool is None or not is_pure(tool):
+            return None
+        return name, json.dumps(arguments, sort_keys=True, default=str)
+
+    def _run_level(self, requests):
+        """Runs (name, arguments) requests concurrently. Returns results or exceptions, in request order."""
+        async_indices = [i for i, (name, _) in enumerate(requests) if name in self.tools and is_async_tool(self.tools[name])]
+        sync_indices = [i for i in range(len(requests)) if i not in async_indices]
+        if len(requests) == 1 and not async_indices:
+            return [self._run_sync(*requests[0])]
+
+        outcomes = [None] * len(requests)
+
+        # Tool threads inherit the caller's context (e.g. the active trace run). Async tools get
+        # their event loop on a pool thread too, as the caller may already be running one.
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="tool-call") as pool:
+            futures = {
+                i: pool.submit(contextvars.copy_context().run, self._run_sync, *requests[i]) for i in sync_indices
+            }
+            if async_indices:
+                batch = pool.submit(contextvars.copy_context().run, self._run_async_batch,
+                                    [requests[i] for i in async_indices])
+            for i, future in futures.items():
+                outcomes[i] = future.result()
+            if async_indices:
+                for i, outcome in zip(async_indices, batch.result()):
+                    outcomes[i] = outcome
+        return outcomes
+
+    def _run_sync(self, name, arguments):
+        try:
+            return self.execute_tool_call(name, dict(arguments) if isinstance(arguments, dict) else arguments)
+        except Exception as e:
+            return e
+
+    def _run_async_batch(self, requests):
+        async def gather():
+            return await asyncio.gather(*(self._run_async(name, arguments) for name, arguments in requests),
+                                        return_exceptions=True)
+
+        return asyncio.run(gather())
+
+    async def _run_async(self, name, arguments):
+        """execute_tool_call for async tools: the same state substitution, sanitization and error message."""
+        tool = self.tools[name]
+        if not isinstance(arguments, (dict, str)):
+            raise AgentExecutionError(
+                f"Arguments passed to tool should be a dict or string: got a {type(arguments)}.", self.logger
+            )
+        try:
+            if isinstance(arguments, str):
+                return await call_async_tool(tool, arguments, sanitize_inputs_outputs=True)
+            arguments = {key: self.state[value] if isinstance(value, str) and value in self.state else value
+                         for key, value in arguments.items()}
+            return await call_async_tool(tool, **arguments, sanitize_inputs_outputs=True)
+        except Exception as e:
+            raise AgentExecutionError(
+                f"Error in tool call execution: {e}\nYou should only use this tool with a correct input.\n"
+                f"As a reminder, this tool's description is the following:\n{get_tool_description_with_args(tool)}",
+                self.logger,
+            )
+
+    def _observation_text(self, observation):
+        if isinstance(observation, (AgentImage, AgentAudio)):
+            name = "image.png" if isinstance(observation, AgentImage) else "audio.mp3"
+            self.state[name] = observation
+            return f"Stored '{name}' in memory."
+        return str(observation).strip()
@@ -1,17 +1,22 @@
-from io import BytesIO
-from time import sleep
+import argparse
+import functools
 
-import helium
 from dotenv import load_dotenv
-from PIL import Image
-from selenium import webdriver
-from selenium.common.exceptions import ElementNotInteractableException, TimeoutException
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.ui import WebDriverWait
 
 from smolagents import CodeAgent, LiteLLMModel, OpenAIServerModel, TransformersModel, tool, HfApiModel  # noqa: F401
-from smolagents.agents import ActionStep
+
+from agent_trace import Tracer, instrument
+from browser_capture import ScreenshotCallback
+from browser_pool import (
+    DriverPool,
+    current_driver,
+    run_browsing_tasks,
+    serve_static,
+    start_chrome,
+    tasks_report,
+)
+from browser_popups import PopupCloser, describe_close_report
+from browser_search import search_page
 
 
 load_dotenv()
@@ -43,59 +48,33 @@ model = LiteLLMModel(
 # Hf model does not work
 #model = HfApiModel("Qwen/Qwen2-VL-7B-Instruct")
 
-# Prepare callback
-def save_screenshot(step_log: ActionStep, agent: CodeAgent) -> None:
-    sleep(1.0)  # Let JavaScript animations happen before taking the screenshot
-    driver = helium.get_driver()
-    current_step = step_log.step_number
-    if driver is not None:
-        for step_logs in agent.logs:  # Remove previous screenshots from logs for lean processing
-            if isinstance(step_log, ActionStep) and step_log.step_number <= current_step - 2:
-                step_logs.observations_images = None
-        png_bytes = driver.get_screenshot_as_png()
-        image = Image.open(BytesIO(png_bytes))
-        print(f"Captured a browser screenshot: {image.size} pixels")
-        step_log.observations_images = [image.copy()]  # Create a copy to ensure it persists, important!
-
-    # Update observations with current URL
-    url_info = f"Current url: {driver.current_url}"
-    step_log.observations = url_info if step_logs.observations is None else step_log.observations + "\n" + url_info
-    return
-
-
-# Initialize driver and agent
-chrome_options = webdriver.ChromeOptions()
-chrome_options.add_argument("--force-device-scale-factor=1")
-chrome_options.add_argument("--window-size=1000,1300")
-chrome_options.add_argument("--disable-pdf-viewer")
+# Pop-up selectors that worked are remembered per domain in this file and tried first.
+popup_closer = PopupCloser(learned_path="popup_selectors.json")
 
-driver = helium.start_chrome(headless=False, options=chrome_options)
-
-# Initialize tools
+# Initialize tools: they act on the browser bound to the running task (see browser_pool)
 
 
 @tool
-def search_item_ctrl_f(text: str, nth_result: int = 1) -> str:
+def search_item_ctrl_f(text: str, nth_result: int = 1, fuzzy: bool = False) -> str:
     """
     Searches for text on the current page via Ctrl + F and jumps to the nth occurrence.
     Args:
-        text: The text to search for
+        text: The text to search for (case-insensitive)
         nth_result: Which occurrence to jump to (default: 1)
+        fuzzy: Also ignore accents and whitespace, and accept near matches for misspelled text (default: False)
     """
-    elements = driver.find_elements(By.XPATH, f"//*[contains(text(), '{text}')]")
-    if nth_result > len(elements):
-        raise Exception(f"Match n°{nth_result} not found (only {len(elements)} matches found)")
-    result = f"Found {len(elements)} matches for '{text}'."
-    elem = elements[nth_result - 1]
-    driver.execute_script("arguments[0].scrollIntoView(true);", elem)
-    result += f"Focused on element {nth_result} of {len(elements)}"
+    found = search_page(current_driver(), text, nth_result, mode="fuzzy" if fuzzy else "ignore_case")
+    if nth_result > found["count"]:
+        raise Exception(f"Match n°{nth_result} not found (only {found['count']} matches found)")
+    result = f"Found {found['count']} {'approximate ' if found['approximate'] else ''}matches for '{text}'."
+    result += f" Focused on element {nth_result} of {found['count']}: {found['snippet']}"
     return result
 
 
 @tool
 def go_back() -> None:
     """Goes back to previous page."""
-    driver.back()
+    current_driver().back()
 
 
 @tool
@@ -103,52 +82,25 @@ def close_popups() -> str:
     """
     Closes any visible modal or pop-up on the page. Use this to dismiss pop-up windows! This does not work on cookie consent banners.
     """
-    # Common selectors for modal close buttons and overlay elements
-    modal_selectors = [
-        "button[class*='close']",
-        "[class*='modal']",
-        "[class*='modal'] button",
-        "[class*='CloseButton']",
-        "[aria-label*='close']",
-        ".modal-close",
-        ".close-modal",
-        ".modal .close",
-        ".modal-backdrop",
-        ".modal-overlay",
-        "[class*='overlay']",
-    ]
-
-    wait = WebDriverWait(driver, timeout=0.5)
-
-    for selector in modal_selectors:
-        try:
-            elements = wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, selector)))
-
-            for element in elements:
-                if element.is_displayed():
-                    try:
-                        # Try clicking with JavaScript as it's more reliable
-                        driver.execute_script("arguments[0].click();", element)
-                    except ElementNotInteractableException:
-                        # If JavaScript click fails, try regular click
-                        element.click()
-
-        except TimeoutException:
-            continue
-        except Exception as e:
-            print(f"Error handling selector {selector}: {str(e)}")
-            continue
-    return "Modals closed"
-
-
-agent = CodeAgent(
-    tools=[go_back, close_popups, search_item_ctrl_f],
-    model=model,
-    additional_authorized_imports=["helium"],
-    step_callbacks=[save_screenshot],
-    max_steps=20,
-    verbosity_level=2,
-)
+    return describe_close_report(popup_closer.close(current_driver()))
+
+
+def make_agent(verbosity_level=2, tracer=None):
+    # The callback waits for the page to settle (instead of a fixed sleep), then
+    # attaches a downscaled screenshot; only the last 2 steps keep theirs.
+    save_screenshot = ScreenshotCallback(current_driver, keep_steps=2, max_size=(1000, 1300), settle_timeout=2.0,
+                                         verbose=verbosity_level > 0)
+    agent = CodeAgent(
+        tools=[go_back, close_popups, search_item_ctrl_f],
+        model=model,
+        additional_authorized_imports=["helium"],
+        step_callbacks=[save_screenshot],
+        max_steps=20,
+        verbosity_level=verbosity_level,
+    )
+    # Splits each step into model, tool, settle wait, screenshot and decode time.
+    instrument(agent, tracer)
+    return agent
 
 helium_instructions = """
 You can use helium to access websites. Don't bother about the helium driver, it's already managed.
@@ -225,4 +177,60 @@ learn_quran_request = """
 I want to understand of surah Yasin, please navigate to https://quran.com/36 and give me general message of this surah. Close any navigation, make sure to scroll down and read all the surah translation before giving your final answer.
 """
 
-agent.run(search_request + helium_instructions)
+
+_worker_tracer = Tracer()
+
+
+def run_browsing_task(request, trace_prefix=None):
+    """Answers one request on the browser bound by the pool worker running it."""
+    try:
+        return make_agent(verbosity_level=0, tracer=_worker_tracer).run(request + helium_instructions)
+    finally:
+        if trace_prefix:
+            # One trace per worker process, holding every task it ran so far.
+            _worker_tracer.export(f"{trace_prefix}-{os.getpid()}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Browse the web with a vision agent.")
+    parser.add_argument("--requests", default=None,
+                        help="File of browsing requests separated by blank lines, answered on a pool of headless browsers")
+    parser.add_argument("-j", "--workers", type=int, default=4, help="Browsers running requests at once (default: 4)")
+    parser.add_argument("--headless", action="store_true", help="Run the single-request browser headless")
+    parser.add_argument("--serve", default=None, metavar="DIR",
+                        help="Serve DIR on localhost for testing; {base_url} in requests is replaced by its URL")
+    parser.add_argument("--trace", default=None, metavar="PREFIX",
+                        help="Write traces to PREFIX.jsonl and PREFIX.trace.json (Chrome trace format); "
+                             "with --requests, one PREFIX-<pid> pair per worker")
+    args = parser.parse_args(argv)
+
+    base_url = None
+    if args.serve:
+        _, base_url = serve_static(args.serve)
+        print(f"Serving {args.serve} at {base_url}")
+
+    if not args.requests:
+        pool = DriverPool(1, lambda: start_chrome(headless=args.headless))
+        tracer = Tracer()
+        try:
+            with pool.driver():
+                make_agent(tracer=tracer).run(search_request + helium_instructions)
+        finally:
+            pool.close()
+        if args.trace:
+            print("Trace written to " + " and ".join(tracer.export(args.trace)))
+        return
+
+    with open(args.requests, encoding="utf-8") as f:
+        requests = [request.strip() for request in f.read().split("\n\n") if request.strip()]
+    if base_url:
+        requests = [request.replace("{base_url}", base_url) for request in requests]
+    results, wall_seconds = run_browsing_tasks(requests, functools.partial(run_browsing_task, trace_prefix=args.trace),
+                                                   workers=args.workers)
+    for result in results:
+        print(f"Q: {result.request}\nA: {result.error or result.answer}\n")
+    print(tasks_report(results, wall_seconds))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,194 +1,906 @@
-from PIL import Image, ImageDraw, ImageFont
-from pygments import highlight
-from pygments.lexers import PythonLexer
-from pygments.formatters import ImageFormatter
+from PIL import GifImagePlugin, Image, ImageChops, ImageColor, ImageDraw, ImageFont
+from pygments.formatters.img import FontManager
+from pygments.lexers import get_lexer_by_name, get_lexer_for_filename
+from pygments.styles import get_style_by_name
+from pygments.util import ClassNotFound
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import dataclasses
+import functools
+import glob
 import io
+import json
+import os
+import subprocess
+import sys
+import time
+
+from slide_cache import SlideCache, content_key
+
+GRADIENT_DIRECTIONS = ("vertical", "horizontal", "diagonal")
+
+
+def _to_rgb(color):
+    """Normalizes a color given as an RGB tuple or a PIL color string."""
+    if isinstance(color, str):
+        return ImageColor.getrgb(color)[:3]
+    return tuple(int(c) for c in color[:3])
+
+
+def _gradient_lut(stops):
+    """Builds a 768-entry RGB lookup table mapping ramp levels 0..255 to colors."""
+    n_stops = len(stops)
+    lut = [[], [], []]
+    for level in range(256):
+        blend_factor = level / 255
+        color_index = min(int(blend_factor * (n_stops - 1)), n_stops - 2)
+        segment_factor = (blend_factor * (n_stops - 1)) - color_index
+        c1 = stops[color_index]
+        c2 = stops[color_index + 1]
+        for channel in range(3):
+            lut[channel].append(int(c1[channel] + (c2[channel] - c1[channel]) * segment_factor))
+    return lut[0] + lut[1] + lut[2]
+
+
+def _ramp(length, vertical):
+    """A one pixel wide 'L' strip whose levels run from 0 to exactly 255 over length pixels."""
+    levels = bytes(round(i * 255 / (length - 1)) for i in range(length)) if length > 1 else b"\0"
+    return Image.frombytes('L', (1, length) if vertical else (length, 1), levels)
+
+
+@functools.lru_cache(maxsize=32)
+def _cached_gradient(width, height, stops, direction):
+    """Renders a gradient once per (size, stops, direction); see generate_gradient_background."""
+    if len(stops) == 1:
+        return Image.new('RGB', (width, height), stops[0])
+    if direction == "diagonal" and min(width, height) == 1:
+        direction = "vertical" if width == 1 else "horizontal"
+
+    # An 'L' ramp built at the target length (so the first and last pixels are
+    # exactly the first and last stops) is mapped through the color stops with
+    # a single LUT pass. Straight gradients map a one pixel strip and replicate
+    # it across the other axis; diagonal ones average a horizontal and a
+    # vertical ramp. No per-pixel Python work.
+    lut = _gradient_lut(stops)
+    if direction == "diagonal":
+        ramp = ImageChops.add(_ramp(width, False).resize((width, height), Image.NEAREST),
+                              _ramp(height, True).resize((width, height), Image.NEAREST), scale=2.0)
+        return Image.merge('RGB', (ramp, ramp, ramp)).point(lut)
+    ramp = _ramp(height, True) if direction == "vertical" else _ramp(width, False)
+    strip = Image.merge('RGB', (ramp, ramp, ramp)).point(lut)
+    return strip.resize((width, height), Image.NEAREST)
+
+
+def generate_gradient_background(width, height, colors, direction="vertical"):
+    """
+    Generates a gradient background image.
+
+    Gradients are built from a ramp of the target length and cached per
+    (width, height, stops, direction), so batch runs with a shared theme
+    only pay for the first background. The returned image is a fresh copy
+    and may be drawn on freely.
+
+    Args:
+        colors (list): One or more color stops, evenly spaced, as RGB tuples or color strings.
+        direction (str): One of "vertical", "horizontal" or "diagonal".
+    """
+    if direction not in GRADIENT_DIRECTIONS:
+        raise ValueError(f"Unknown gradient direction {direction!r}, expected one of {GRADIENT_DIRECTIONS}")
+    stops = tuple(_to_rgb(color) for color in colors) or ((255, 255, 255),)
+    return _cached_gradient(width, height, stops, direction).copy()
 
-def generate_gradient_background(width, height, colors):
-    """Generates a vertical gradient background image."""
-    gradient = Image.new('RGB', (width, height))
-    draw = ImageDraw.Draw(gradient)
-    n_colors = len(colors)
-    for y in range(height):
-        blend_factor = float(y) / (height - 1) if height > 1 else 0
-        if n_colors == 2:
-            c1 = colors[0]
-            c2 = colors[1]
-            r = int(c1[0] + (c2[0] - c1[0]) * blend_factor)
-            g = int(c1[1] + (c2[1] - c1[1]) * blend_factor)
-            b = int(c1[2] + (c2[2] - c1[2]) * blend_factor)
-            color = (r, g, b)
-        elif n_colors > 2:
-            step = height // (n_colors - 1) if n_colors > 1 else height
-            color_index = min(int(blend_factor * (n_colors - 1)), n_colors - 2)
-            segment_factor = (blend_factor * (n_colors - 1)) - color_index
-            c1 = colors[color_index]
-            c2 = colors[color_index+1]
-            r = int(c1[0] + (c2[0] - c1[0]) * segment_factor)
-            g = int(c1[1] + (c2[1] - c1[1]) * segment_factor)
-            b = int(c2[2] + (c2[2] - c2[2]) * segment_factor)
-            color = (r, g, b)
-        else:
-            color = colors[0] if colors else (255, 255, 255)
-        draw.line([(0, y), (width, y)], fill=color)
-    return gradient
 
-def draw_corners_rounded_rectangle(draw_obj, bounds, radius, fill, round_top_left=True, round_top_right=True, round_bottom_left=True, round_bottom_right=True):
-    """Draws a rectangle with specified rounded corners."""
+@functools.lru_cache(maxsize=64)
+def _corner_sprite(radius, color, antialias_factor):
+    """Renders an anti-aliased top-left rounded corner as a radius x radius RGBA sprite."""
+    size = radius * antialias_factor
+    corner = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+    ImageDraw.Draw(corner).ellipse([(0, 0), (2 * size, 2 * size)], fill=color)
+    return corner.resize((radius, radius), Image.LANCZOS)
+
+
+@functools.lru_cache(maxsize=64)
+def _button_sprite(radius, color, antialias_factor):
+    """Renders an anti-aliased window button as a (2 * radius + 1)-pixel RGBA sprite."""
+    size = (2 * radius + 1) * antialias_factor
+    button = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+    ImageDraw.Draw(button).ellipse([(0, 0), (2 * radius * antialias_factor, 2 * radius * antialias_factor)], fill=color)
+    return button.resize((2 * radius + 1, 2 * radius + 1), Image.LANCZOS)
+
+
+def _paste_rounded_panel(image, bounds, radius, color, antialias_factor, round_top=False, round_bottom=False):
+    """
+    Fills bounds (x1, y1, x2, y2, exclusive) nine-slice style: solid rectangles
+    for the edges and center plus cached corner sprites where rounding is asked for.
+    """
     x1, y1, x2, y2 = bounds
-    diameter = radius * 2
+    draw = ImageDraw.Draw(image)
+    top = y1 + radius if round_top else y1
+    bottom = y2 - radius if round_bottom else y2
+    draw.rectangle([(x1, top), (x2 - 1, bottom - 1)], fill=color)
+
+    corner = _corner_sprite(radius, color, antialias_factor)
+    if round_top:
+        draw.rectangle([(x1 + radius, y1), (x2 - radius - 1, top - 1)], fill=color)
+        image.paste(corner, (x1, y1))
+        image.paste(corner.transpose(Image.Transpose.FLIP_LEFT_RIGHT), (x2 - radius, y1))
+    if round_bottom:
+        draw.rectangle([(x1 + radius, bottom), (x2 - radius - 1, y2 - 1)], fill=color)
+        corner = corner.transpose(Image.Transpose.FLIP_TOP_BOTTOM)
+        image.paste(corner, (x1, bottom))
+        image.paste(corner.transpose(Image.Transpose.FLIP_LEFT_RIGHT), (x2 - radius, bottom))
+
+
+@functools.lru_cache(maxsize=16)
+def _cached_terminal_chrome(width, height, bar_height, background_color, bar_color, corner_radius,
+                            top_corner_radius, button_x, button_y_offset, button_radius, button_spacing,
+                            button_colors, antialias_factor):
+    chrome = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+    # Top rounded only for bar, bottom rounded only for background
+    _paste_rounded_panel(chrome, (0, 0, width, bar_height), top_corner_radius, bar_color,
+                         antialias_factor, round_top=True)
+    _paste_rounded_panel(chrome, (0, bar_height, width, height), corner_radius, background_color,
+                         antialias_factor, round_bottom=True)
 
-    if round_top_left:
-        draw_obj.ellipse([(x1, y1), (x1 + diameter, y1 + diameter)], fill=fill) # top-left
-    else:
-        draw_obj.rectangle([(x1, y1), (x1 + radius, y1 + radius)], fill=fill) # Square top-left if not rounded
+    for color in button_colors:
+        button = _button_sprite(button_radius, color, antialias_factor)
+        chrome.alpha_composite(button, (button_x - button_radius, button_y_offset))
+        button_x += 2 * button_radius + button_spacing
+    return chrome
 
-    if round_top_right:
-        draw_obj.ellipse([(x2 - diameter, y1), (x2, y1 + diameter)], fill=fill) # top-right
-    else:
-        draw_obj.rectangle([(x2 - radius, y1), (x2, y1 + radius)], fill=fill) # Square top-right if not rounded
 
-    if round_bottom_left:
-        draw_obj.ellipse([(x1, y2 - diameter), (x1 + diameter, y2)], fill=fill) # bottom-left
-    else:
-        draw_obj.rectangle([(x1, y2 - radius), (x1 + radius, y2)], fill=fill) # Square bottom-left if not rounded
+def generate_terminal_chrome(width, height, bar_height, background_color, bar_color, corner_radius=20,
+                             top_corner_radius=20, button_x=50, button_y_offset=20, button_radius=16,
+                             button_spacing=20, button_colors=("#FF5F56", "#FFBD2E", "#27C93F"),
+                             antialias_factor=4):
+    """
+    Generates the empty terminal window: title bar with buttons and the code area.
+
+    The chrome only depends on its size and look, so it is assembled from small
+    pre-rendered anti-aliased corner and button sprites (only those are
+    supersampled) and kept in an LRU keyed by all arguments. The returned image
+    is a fresh copy and may be drawn on freely.
+    """
+    return _cached_terminal_chrome(width, height, bar_height, background_color, bar_color, corner_radius,
+                                   top_corner_radius, button_x, button_y_offset, button_radius,
+                                   button_spacing, tuple(button_colors), antialias_factor).copy()
+
+
+def layout_code(code, lexer, fonts, styles, image_pad, line_pad):
+    """
+    Walks the Pygments token stream and computes glyph runs for the code.
+
+    The geometry follows pygments' ImageFormatter exactly (same fonts, text
+    positions and image size), so drawing the runs gives the same pixels as
+    rendering through the formatter, without the intermediate image.
 
-    if round_bottom_right:
-        draw_obj.ellipse([(x2 - diameter, y2 - diameter), (x2, y2)], fill=fill) # bottom-right
+    Returns:
+        tuple: (runs, (width, height)) where every run is
+               ((x, y), text, font, fill, background) and the size is that of
+               the padded code area.
+    """
+    char_height = fonts.get_char_size()[1]
+    line_height = char_height + line_pad
+    runs = []
+    lineno = 0
+    linelength = maxlinelength = 0
+    for ttype, value in lexer.get_tokens(code):
+        while ttype not in styles:
+            ttype = ttype.parent
+        style = styles[ttype]
+        font = fonts.get_font(style['bold'], style['italic'])
+        fill = '#' + style['color'] if style['color'] is not None else '#000'
+        background = '#' + style['bgcolor'] if style['bgcolor'] is not None else None
+
+        for line in value.expandtabs(4).splitlines(True):
+            text = line.rstrip('\n')
+            if text:
+                runs.append(((linelength + image_pad, lineno * line_height + image_pad), text, font, fill, background))
+                linelength += fonts.get_text_size(text)[0]
+                maxlinelength = max(maxlinelength, linelength)
+            if line.endswith('\n'):
+                linelength = 0
+                lineno += 1
+
+    return runs, (maxlinelength + 2 * image_pad, lineno * line_height + 2 * image_pad)
+
+
+def draw_code_runs(draw, runs, offset=(0, 0)):
+    """Draws glyph runs from layout_code at offset onto an ImageDraw."""
+    offset_x, offset_y = offset
+    for (x, y), text, font, fill, background in runs:
+        position = (x + offset_x, y + offset_y)
+        if background:
+            text_width, text_height = font.getbbox(text)[2:]
+            draw.rectangle([position, (position[0] + text_width, position[1] + text_height)], fill=background)
+        draw.text(position, text, font=font, fill=fill)
+
+
+# --- Encoding ---
+IMAGE_FORMATS = {"png": "PNG", "webp": "WEBP", "jpeg": "JPEG", "jpg": "JPEG"}
+
+
+def encoder_options(fmt="png", compress_level=None, quality=None, lossless=None):
+    """
+    Normalizes an output format and its encoder settings.
+
+    Args:
+        fmt (str): "png", "webp" or "jpeg" ("jpg").
+        compress_level (int, optional): PNG zlib level 0-9. Pillow defaults to 6;
+                                        1 is several times faster for slightly larger files.
+        quality (int, optional): JPEG / lossy WebP quality, or lossless WebP effort (0-100).
+        lossless (bool, optional): WebP only. Defaults to True, which keeps text crisp.
+
+    Returns:
+        tuple: (PIL format name, save() keyword arguments)
+    """
+    pil_format = IMAGE_FORMATS.get(fmt.lower())
+    if pil_format is None:
+        raise ValueError(f"Unsupported format {fmt!r}, expected one of {sorted(IMAGE_FORMATS)}")
+    options = {}
+    if pil_format == "PNG":
+        if compress_level is not None:
+            options["compress_level"] = compress_level
+    elif pil_format == "WEBP":
+        options["lossless"] = True if lossless is None else lossless
+        if quality is not None:
+            options["quality"] = quality
     else:
-        draw_obj.rectangle([(x2 - radius, y2 - radius), (x2, y2)], fill=fill) # Square bottom-right if not rounded
-
-
-    # Edges (rectangles to connect corners):
-    draw_obj.rectangle([(x1 + (radius if round_top_left else 0), y1), (x2 - (radius if round_top_right else 0) - 1, y1 + radius)], fill=fill) # top edge
-    draw_obj.rectangle([(x1 + (radius if round_bottom_left else 0), y2 - radius - 1), (x2 - (radius if round_bottom_right else 0) - 1, y2)], fill=fill) # bottom edge
-    draw_obj.rectangle([(x1, y1 + (radius if round_top_left else 0)), (x1 + radius, y2 - (radius if round_bottom_left else 0) - 1)], fill=fill) # left edge
-    draw_obj.rectangle([(x2 - radius - 1, y1 + (radius if round_top_right else 0)), (x2, y2 - (radius if round_bottom_right else 0) - 1)], fill=fill) # right edge
-
-    # Center rectangle:
-    draw_obj.rectangle([(x1 + radius, y1 + radius), (x2 - radius - 1, y2 - radius - 1)], fill=fill) # center
-
-
-def generate_terminal_image(code):
-    """Generates just the terminal image with code, no background."""
-    # --- Terminal Settings ---
-    terminal_background_color = "#282A36"
-    terminal_bar_color = "#44475A"
-    terminal_corner_radius = 20
-    terminal_top_corner_radius = 20
-
-    font_family = "JetBrainsMono-Regular.ttf"
-    font_size = 60
-    line_height = int(font_size * 1.3)
-
-    padding_x = 100
-    padding_y = 40
-
-    terminal_bar_height = 80
-    terminal_button_radius = 16
-    terminal_button_spacing = 20
-    terminal_button_y_offset = 20
-    corner_antialias_factor = 4
-
-    # --- ImageFormatter Configuration ---
-    formatter = ImageFormatter(
-        style='dracula',
-        font_name=font_family,
-        font_size=font_size,
-        background=terminal_background_color,
-        line_number_bg=terminal_background_color,
-        line_number_fg="#F8F8F2",
-        line_numbers=False,
-        image_pad=padding_x,
-        line_pad=line_height - font_size
-    )
+        options["quality"] = 90 if quality is None else quality
+    return pil_format, options
+
+
+def _prepare_for_format(image, pil_format):
+    """Drops the alpha channel only when the target format cannot store it."""
+    if pil_format != "JPEG" or image.mode == "RGB":
+        return image
+    if image.mode == "RGBA" and image.getextrema()[3][0] < 255:
+        raise ValueError("JPEG has no alpha channel; render the slide with_background=True or use png/webp")
+    return image.convert("RGB")
+
+
+def encode_image(image, fmt="png", as_memoryview=False, **options):
+    """
+    Encodes an image in memory, without touching the filesystem.
+
+    Args:
+        fmt (str): Output format; see encoder_options for `options`.
+        as_memoryview (bool): Return a zero-copy memoryview of the encoder's
+                              buffer instead of a bytes copy.
+    """
+    pil_format, save_options = encoder_options(fmt, **options)
+    buffer = io.BytesIO()
+    _prepare_for_format(image, pil_format).save(buffer, format=pil_format, **save_options)
+    return buffer.getbuffer() if as_memoryview else buffer.getvalue()
+
+
+def save_image(image, output_path, fmt=None, **options):
+    """Saves an image with encoder_options; fmt defaults to the file extension."""
+    fmt = fmt or os.path.splitext(output_path)[1].lstrip(".") or "png"
+    pil_format, save_options = encoder_options(fmt, **options)
+    _prepare_for_format(image, pil_format).save(output_path, format=pil_format, **save_options)
+
+
+@dataclasses.dataclass(frozen=True)
+class Theme:
+    """Look of a code slide. Themes are hashable, so they double as cache keys."""
+    style: str = 'dracula'
+    font_family: str = "JetBrainsMono-Regular.ttf"
+    font_size: int = 60
+    line_spacing: float = 1.3
+
+    terminal_background_color: str = "#282A36"
+    terminal_bar_color: str = "#44475A"
+    terminal_corner_radius: int = 20
+    terminal_top_corner_radius: int = 20
+    terminal_min_width: int = 1200
+
+    padding_x: int = 100
+    padding_y: int = 40
+
+    terminal_bar_height: int = 80
+    terminal_button_radius: int = 16
+    terminal_button_spacing: int = 20
+    terminal_button_y_offset: int = 20
+    terminal_button_colors: tuple = ("#FF5F56", "#FFBD2E", "#27C93F")
+    corner_antialias_factor: int = 4
+
+    background_size: tuple = (1920, 1080)
+    gradient_colors: tuple = ((255, 0, 255), (0, 0, 255))
+    gradient_direction: str = "vertical"
+
+    @property
+    def line_height(self):
+        return int(self.font_size * self.line_spacing)
 
-    lexer = PythonLexer()
-    highlighted_code_bytes = highlight(code, lexer, formatter)
-    highlighted_code_image = Image.open(io.BytesIO(highlighted_code_bytes))
-    code_width, code_height = highlighted_code_image.size
-
-    # --- Calculate Terminal Image Size ---
-    terminal_image_width = max(code_width + 2 * padding_x, 1200)
-    terminal_image_height = terminal_bar_height + padding_y + code_height + padding_y
-
-    # --- Create Terminal Image (RGBA for transparency) ---
-    terminal_image = Image.new('RGBA', (terminal_image_width, terminal_image_height), (0, 0, 0, 0))
-    d_terminal = ImageDraw.Draw(terminal_image)
-
-    # --- Draw Terminal Background with Rounded Corners (Anti-aliased) ---
-    terminal_background_image = Image.new('RGBA', (terminal_image_width * corner_antialias_factor, (terminal_image_height - terminal_bar_height) * corner_antialias_factor), (0,0,0,0))
-    d_terminal_bg = ImageDraw.Draw(terminal_background_image)
-    terminal_bg_bounds_large = (0, 0, terminal_image_width * corner_antialias_factor, (terminal_image_height - terminal_bar_height) * corner_antialias_factor)
-    corner_radius_large = terminal_corner_radius * corner_antialias_factor
-    draw_corners_rounded_rectangle(d_terminal_bg, terminal_bg_bounds_large, corner_radius_large, terminal_background_color,
-                                     round_top_left=False, round_top_right=False, round_bottom_left=True, round_bottom_right=True) # Bottom rounded only for background
-
-    terminal_background_image_resized = terminal_background_image.resize((terminal_image_width, terminal_image_height - terminal_bar_height), Image.LANCZOS)
-    terminal_image.paste(terminal_background_image_resized, (0, terminal_bar_height), mask=terminal_background_image_resized)
-
-
-    # --- Create Terminal Bar Image for Buttons (Anti-aliased Top Rounded Corners) ---
-    terminal_bar_image_buttons = Image.new('RGBA', (terminal_image_width * corner_antialias_factor, terminal_bar_height * corner_antialias_factor), (0,0,0,0))
-    d_bar_buttons = ImageDraw.Draw(terminal_bar_image_buttons)
-    terminal_bar_bounds_large = (0, 0, terminal_image_width * corner_antialias_factor, terminal_bar_height * corner_antialias_factor)
-    top_corner_radius_large = terminal_top_corner_radius * corner_antialias_factor
-    draw_corners_rounded_rectangle(d_bar_buttons, terminal_bar_bounds_large, top_corner_radius_large, terminal_bar_color,
-                                     round_top_left=True, round_top_right=True, round_bottom_left=False, round_bottom_right=False) # Top rounded only for bar
-
-    button_x_large = padding_x * corner_antialias_factor // 2
-    button_radius_large = terminal_button_radius * corner_antialias_factor
-    button_spacing_large = terminal_button_spacing * corner_antialias_factor
-    terminal_button_y_offset_large = terminal_button_y_offset * corner_antialias_factor
-
-    button_colors = ["#FF5F56", "#FFBD2E", "#27C93F"]
-    for color in button_colors:
-        d_bar_buttons.ellipse([(button_x_large - button_radius_large, terminal_button_y_offset_large),
-                       (button_x_large + button_radius_large, terminal_button_y_offset_large + 2*button_radius_large)],
-                      fill=color)
-        button_x_large += 2 * button_radius_large + button_spacing_large
 
-    terminal_bar_image_buttons_resized = terminal_bar_image_buttons.resize((terminal_image_width, terminal_bar_height), Image.LANCZOS)
-    terminal_image.paste(terminal_bar_image_buttons_resized, (0, 0), mask=terminal_bar_image_buttons_resized)
+class SlideRenderer:
+    """
+    Renders code slides for one theme.
+
+    Fonts, the style table and lexers are loaded when the renderer is created
+    (lexers on first use) and stay warm for its lifetime, so long-running
+    processes pay the startup cost once instead of once per slide.
+
+    Args:
+        theme (Theme, optional): Look of the slides. Defaults to Theme().
+        lexer (str, optional): Default Pygments lexer name. Defaults to "python".
+    """
+
+    def __init__(self, theme=None, lexer="python"):
+        self.theme = theme or Theme()
+        self.default_lexer = lexer
+        self.fonts = FontManager(self.theme.font_family, self.theme.font_size)
+        self.styles = dict(get_style_by_name(self.theme.style))
+        self._lexers = {}
+        self.get_lexer(lexer)
+
+    def get_lexer(self, name=None):
+        """Returns the cached Pygments lexer for name (the default lexer when None)."""
+        name = name or self.default_lexer
+        lexer = self._lexers.get(name)
+        if lexer is None:
+            lexer = self._lexers[name] = get_lexer_by_name(name)
+        return lexer
+
+    def layout(self, code, lexer=None):
+        """Lays out code into glyph runs; see layout_code."""
+        theme = self.theme
+        return layout_code(code, self.get_lexer(lexer), self.fonts, self.styles,
+                           image_pad=theme.padding_x, line_pad=theme.line_height - theme.font_size)
+
+    def terminal_size(self, code_size):
+        """Size of the terminal window holding a code area of code_size."""
+        theme = self.theme
+        code_width, code_height = code_size
+        return (max(code_width + 2 * theme.padding_x, theme.terminal_min_width),
+                theme.terminal_bar_height + theme.padding_y + code_height + theme.padding_y)
+
+    def code_offset(self):
+        """Position of the code area inside the terminal window."""
+        return self.theme.padding_x, self.theme.terminal_bar_height + self.theme.padding_y
+
+    def chrome(self, size):
+        """Returns a fresh copy of the (cached) empty terminal window of the given size."""
+        theme = self.theme
+        return generate_terminal_chrome(
+            size[0], size[1], theme.terminal_bar_height,
+            theme.terminal_background_color, theme.terminal_bar_color,
+            corner_radius=theme.terminal_corner_radius,
+            top_corner_radius=theme.terminal_top_corner_radius,
+            button_x=theme.padding_x // 2,
+            button_y_offset=theme.terminal_button_y_offset,
+            button_radius=theme.terminal_button_radius,
+            button_spacing=theme.terminal_button_spacing,
+            button_colors=theme.terminal_button_colors,
+            antialias_factor=theme.corner_antialias_factor,
+        )
+
+    def background(self):
+        """Returns a fresh copy of the (cached) gradient background."""
+        width, height = self.theme.background_size
+        return generate_gradient_background(width, height, self.theme.gradient_colors,
+                                            direction=self.theme.gradient_direction)
+
+    def terminal_position(self, terminal_size):
+        """Position that centers a terminal of terminal_size on the background."""
+        width, height = self.theme.background_size
+        return (width - terminal_size[0]) // 2, (height - terminal_size[1]) // 2
+
+    def render_terminal(self, code, lexer=None):
+        """Renders just the terminal image with code, no background."""
+        runs, code_size = self.layout(code, lexer)
+        terminal_image = self.chrome(self.terminal_size(code_size))
+        draw_code_runs(ImageDraw.Draw(terminal_image), runs, offset=self.code_offset())
+        return terminal_image
+
+    def compose(self, terminal_image):
+        """Centers a terminal image on the gradient background."""
+        background_image = self.background()
+        background_image.paste(terminal_image, self.terminal_position(terminal_image.size), mask=terminal_image)
+        return background_image
+
+    def render(self, code, with_background=False, lexer=None):
+        """Renders a code slide and returns the PIL image."""
+        terminal_image = self.render_terminal(code, lexer)
+        if not with_background:
+            return terminal_image
+        return self.compose(terminal_image)
+
+    def cache_key(self, code, with_background=False, lexer=None, fmt="png", **options):
+        """Content hash of everything that affects the encoded output, for SlideCache."""
+        return content_key(dataclasses.asdict(self.theme), code, lexer or self.default_lexer,
+                           with_background, encoder_options(fmt, **options))
+
+    def render_bytes(self, code, fmt="png", with_background=False, lexer=None, as_memoryview=False, **options):
+        """
+        Renders a code slide and returns it encoded in memory.
+
+        See encode_image for `as_memoryview` and encoder_options for `fmt` and `options`.
+        """
+        image = self.render(code, with_background=with_background, lexer=lexer)
+        return encode_image(image, fmt, as_memoryview=as_memoryview, **options)
+
+    def iter_typing_frames(self, code, with_background=False, lexer=None, unit="line"):
+        """
+        Yields the frames of a "typing" animation of code as (frame, dirty_box).
+
+        The first frame is the empty terminal; every following frame reveals one
+        more line (unit="line") or token (unit="token"). All frames share one
+        canvas that starts from the cached chrome (and background) and only gets
+        the newly revealed glyphs drawn into it, so memory stays flat no matter
+        how long the animation is. dirty_box (x1, y1, x2, y2) bounds the pixels
+        that changed since the previous frame.
+
+        The canvas is mutated in place: consumers must encode or copy a frame
+        before advancing the generator.
+        """
+        if unit not in ("line", "token"):
+            raise ValueError(f"Unknown typing unit {unit!r}, expected 'line' or 'token'")
+        runs, code_size = self.layout(code, lexer)
+        terminal_size = self.terminal_size(code_size)
+        canvas = self.chrome(terminal_size)
+        offset_x, offset_y = self.code_offset()
+        if with_background:
+            canvas = self.compose(canvas)
+            position = self.terminal_position(terminal_size)
+            offset_x, offset_y = offset_x + position[0], offset_y + position[1]
+
+        draw = ImageDraw.Draw(canvas)
+        yield canvas, (0, 0) + canvas.size
+        for group in _group_runs(runs, unit):
+            draw_code_runs(draw, group, offset=(offset_x, offset_y))
+            yield canvas, _runs_bbox(group, (offset_x, offset_y), canvas.size)
+
+    def render_typing_animation(self, code, output_path, with_background=False, lexer=None, unit="line",
+                                frame_duration=100, hold_duration=2000):
+        """
+        Renders a "typing" animation of code to output_path.
+
+        GIFs are written by a streaming encoder that stores only the dirty
+        rectangle of every frame. MP4 and animated WebP stream raw frames into
+        ffmpeg, which must be on PATH.
+
+        Args:
+            output_path (str): A .gif, .mp4 or .webp file.
+            unit (str): "line" or "token", what each frame reveals.
+            frame_duration (int): Milliseconds per frame.
+            hold_duration (int): Milliseconds the finished slide stays on screen.
+        """
+        frames = self.iter_typing_frames(code, with_background=with_background, lexer=lexer, unit=unit)
+        ext = os.path.splitext(output_path)[1].lower()
+        if ext == ".gif":
+            palette_source = self.render(code, with_background=with_background, lexer=lexer)
+            write_gif_frames(frames, output_path, palette_source, frame_duration, hold_duration)
+        elif ext in (".mp4", ".webp"):
+            write_ffmpeg_frames(frames, output_path, frame_duration, hold_duration)
+        else:
+            raise ValueError(f"Unsupported animation format {ext!r}, expected .gif, .mp4 or .webp")
+
+@functools.lru_cache(maxsize=8)
+def get_renderer(theme=None):
+    """Returns the shared SlideRenderer for theme (the default theme when None)."""
+    return SlideRenderer(theme)
+
 
-    # --- Paste Highlighted Code Image onto Terminal Image ---
-    code_y_position = terminal_bar_height + padding_y
-    terminal_image.paste(highlighted_code_image, (padding_x, code_y_position))
+def generate_terminal_image(code, lexer="python"):
+    """Generates just the terminal image with code, no background. `lexer` is any Pygments lexer name."""
+    return get_renderer().render_terminal(code, lexer=lexer)
 
-    return terminal_image
 
+def render_code_slide(code, with_background=False, lexer="python"):
+    """Renders a code slide and returns the PIL image without saving it."""
+    return get_renderer().render(code, with_background=with_background, lexer=lexer)
 
-def generate_code_slide(code, output_path="code_slide.png", with_background=False):
+
+def generate_code_slide(code, output_path="code_slide.png", with_background=False, lexer="python", cache=None,
+                        fmt=None, as_memoryview=False, **options):
     """
     Generates a code slide, either with or without a background.
 
     Args:
-        code (str): The Python code to display.
-        output_path (str): Path to save the output image.
+        code (str): The code to display.
+        output_path (str): Path to save the output image. When None, nothing is
+                           written and the encoded image is returned instead.
         with_background (bool, optional): Whether to include a gradient background.
                                          Defaults to True (with background).
+        lexer (str, optional): Pygments lexer name used for highlighting. Defaults to "python".
+        cache (SlideCache, optional): Serve unchanged slides from this on-disk cache.
+        fmt (str, optional): "png", "webp" or "jpeg" (background only). Defaults to
+                             the extension of output_path, or png in memory.
+        as_memoryview (bool, optional): In memory only, return a memoryview instead of bytes.
+        **options: Encoder settings, see encoder_options (compress_level, quality, lossless).
     """
-    terminal_image = generate_terminal_image(code)
+    if output_path is None:
+        return get_renderer().render_bytes(code, fmt or "png", with_background=with_background, lexer=lexer,
+                                           as_memoryview=as_memoryview, **options)
 
     if with_background:
-        background_width = 1920 #* 1.5
-        background_height = 1080
-        gradient_colors = [(255, 0, 255), (0, 0, 255)]
-        background_image = generate_gradient_background(background_width, background_height, gradient_colors)
-
-        terminal_x_position = (background_width - terminal_image.width) // 2
-        terminal_y_position = (background_height - terminal_image.height) // 2
-        background_image.paste(terminal_image, (terminal_x_position, terminal_y_position), mask=terminal_image)
-        final_image = background_image
         output_message = f"Code slide with background saved to {output_path}"
     else:
-        final_image = terminal_image
         output_message = f"Terminal code slide (no background) saved to {output_path}"
 
-    final_image.save(output_path)
+    if cache is None:
+        save_image(render_code_slide(code, with_background=with_background, lexer=lexer), output_path, fmt, **options)
+    else:
+        hit = _render_cached(get_renderer(), cache, code, output_path, with_background, lexer, fmt, **options)
+        if hit:
+            output_message += " (cached)"
     print(output_message)
 
 
+def _render_cached(renderer, cache, code, output_path, with_background, lexer, fmt=None, **options):
+    """Renders through cache, returning True on a hit."""
+    fmt = fmt or os.path.splitext(output_path)[1].lstrip(".") or "png"
+    key = renderer.cache_key(code, with_background=with_background, lexer=lexer, fmt=fmt, **options)
+    return cache.get_or_render(
+        key, output_path,
+        lambda path: save_image(renderer.render(code, with_background=with_background, lexer=lexer),
+                                path, fmt, **options),
+    )
+
+
+# --- Typing Animations ---
+def _group_runs(runs, unit):
+    """Splits glyph runs into the groups revealed per frame; whitespace never gets a frame of its own."""
+    group = []
+    for run in runs:
+        if unit == "line" and group and run[0][1] != group[-1][0][1]:
+            yield group
+            group = []
+        group.append(run)
+        if unit == "token" and run[1].strip():
+            yield group
+            group = []
+    if group:
+        yield group
+
+
+def _runs_bbox(runs, offset, canvas_size):
+    """Bounding box of the pixels touched by draw_code_runs(runs, offset), clipped to the canvas."""
+    x1 = y1 = float("inf")
+    x2 = y2 = float("-inf")
+    for (x, y), text, font, _, _ in runs:
+        left, top, right, bottom = font.getbbox(text)
+        x, y = x + offset[0], y + offset[1]
+        x1, y1 = min(x1, x + min(left, 0)), min(y1, y + min(top, 0))
+        x2, y2 = max(x2, x + right + 1), max(y2, y + bottom + 1)
+    return (max(int(x1), 0), max(int(y1), 0), min(int(x2), canvas_size[0]), min(int(y2), canvas_size[1]))
+
+
+def write_gif_frames(frames, output_path, palette_source, frame_duration=100, hold_duration=2000):
+    """
+    Streams (frame, dirty_box) pairs into an animated GIF.
+
+    Only the dirty rectangle of each frame is encoded, as a sub-image that is
+    drawn over the previous one, with a single global palette built from
+    palette_source (normally the finished slide). Transparent pixels of the
+    first frame map to a reserved palette entry.
+    """
+    transparent_index = 255
+    palette_image = palette_source.convert('RGB').quantize(colors=255, dither=Image.Dither.NONE)
+    palette = palette_image.getpalette()[:255 * 3]
+    palette_image.putpalette(palette + [0] * (256 * 3 - len(palette)))
+
+    def to_palette(frame, box):
+        region = frame.crop(box)
+        indexed = region.convert('RGB').quantize(palette=palette_image, dither=Image.Dither.NONE)
+        if region.mode == 'RGBA':
+            indexed.paste(transparent_index, mask=region.getchannel('A').point(lambda a: 255 if a < 128 else 0))
+        return indexed
+
+    frames = iter(frames)
+    first, box = next(frames)
+    pending = (to_palette(first, box), box[:2])
+    with open(output_path, "wb") as f:
+        header, _ = GifImagePlugin.getheader(pending[0], info={"loop": 0, "optimize": False,
+                                                               "duration": frame_duration})
+        f.write(b"".join(header))
+        for frame, box in frames:
+            if box[0] >= box[2] or box[1] >= box[3]:
+                continue
+            _write_gif_frame(f, pending, frame_duration, transparent_index)
+            pending = (to_palette(frame, box), box[:2])
+        _write_gif_frame(f, pending, hold_duration, transparent_index)
+        f.write(b";")
+
+
+def _write_gif_frame(f, pending, duration, transparent_index):
+    indexed, offset = pending
+    # disposal=1 keeps every frame on screen, so later sub-images draw on top of it
+    for chunk in GifImagePlugin.getdata(indexed, offset=offset, duration=duration, disposal=1,
+                                        transparency=transparent_index):
+        f.write(chunk)
+
+
+def write_ffmpeg_frames(frames, output_path, frame_duration=100, hold_duration=2000):
+    """
+    Streams (frame, dirty_box) pairs as raw video into ffmpeg.
+
+    Writes H.264 MP4 (alpha is dropped) or animated lossless WebP depending on
+    the output_path extension. ffmpeg must be on PATH.
+    """
+    frames = iter(frames)
+    first, _ = next(frames)
+    width, height = first.size
+    pix_fmt = {'RGBA': 'rgba', 'RGB': 'rgb24'}[first.mode]
+    fps = 1000 / frame_duration
+    if output_path.lower().endswith(".webp"):
+        codec = ["-c:v", "libwebp_anim", "-lossless", "1", "-loop", "0"]
+    else:
+        codec = ["-c:v", "libx264", "-pix_fmt", "yuv420p", "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2"]
+    command = ["ffmpeg", "-loglevel", "error", "-y", "-f", "rawvideo", "-pix_fmt", pix_fmt,
+               "-s", f"{width}x{height}", "-r", f"{fps:g}", "-i", "-", *codec, output_path]
+
+    with subprocess.Popen(command, stdin=subprocess.PIPE) as ffmpeg:
+        ffmpeg.stdin.write(first.tobytes())
+        frame = first
+        for frame, _ in frames:
+            ffmpeg.stdin.write(frame.tobytes())
+        last = frame.tobytes()
+        for _ in range(max(round(hold_duration / frame_duration) - 1, 0)):
+            ffmpeg.stdin.write(last)
+        ffmpeg.stdin.close()
+    if ffmpeg.returncode:
+        raise RuntimeError(f"ffmpeg exited with status {ffmpeg.returncode} while writing {output_path}")
+
+
+def generate_typing_animation(code, output_path="code_slide.gif", with_background=False, lexer="python",
+                              unit="line", frame_duration=100, hold_duration=2000):
+    """Renders a "typing" animation of code; see SlideRenderer.render_typing_animation."""
+    get_renderer().render_typing_animation(code, output_path, with_background=with_background, lexer=lexer,
+                                           unit=unit, frame_duration=frame_duration, hold_duration=hold_duration)
+    print(f"Typing animation saved to {output_path}")
+
+
+# --- Batch Rendering ---
+_batch_cache = None
+
+
+def _init_batch_worker(cache_dir=None):
+    """Loads the fonts, style and default lexer once per worker process."""
+    global _batch_cache
+    get_renderer()
+    # Workers never evict; render_batch trims the cache once at the end.
+    _batch_cache = SlideCache(cache_dir) if cache_dir else None
+
+
+def _render_batch_job(job):
+    """
+    Renders one batch job in a worker and returns (job, seconds, cache_hit, error).
+
+    A failing job (unreadable file, unknown lexer, ...) reports its error
+    instead of raising, so the rest of the batch still renders.
+    """
+    start = time.perf_counter()
+    hit = False
+    try:
+        code = job["code"]
+        if code is None:
+            with open(job["path"], encoding="utf-8") as f:
+                code = f.read()
+        if _batch_cache is None:
+            image = render_code_slide(code, with_background=job["with_background"], lexer=job["lexer"])
+            save_image(image, job["output"], **job["encoder"])
+        else:
+            hit = _render_cached(get_renderer(), _batch_cache, code, job["output"], job["with_background"],
+                                 job["lexer"], **job["encoder"])
+    except Exception as e:
+        return job, time.perf_counter() - start, False, f"{type(e).__name__}: {e}"
+    return job, time.perf_counter() - start, hit, None
+
+
+def _iter_manifest(manifest_path):
+    """Yields the entries of a JSONL manifest, skipping blank lines."""
+    with open(manifest_path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            if "code" not in entry and "path" not in entry:
+                raise ValueError(f"{manifest_path}:{line_number}: entry needs either 'code' or 'path'")
+            yield entry
+
+
+def _guess_lexer_name(path, default="python"):
+    """Picks a Pygments lexer name from a file name, falling back to default."""
+    if path is None:
+        return default
+    try:
+        return get_lexer_for_filename(path).aliases[0]
+    except ClassNotFound:
+        return default
+
+
+def collect_batch_jobs(sources, output_dir, with_background=False, pattern="*.py", lexer=None, fmt="png",
+                       **options):
+    """
+    Expands sources into render jobs.
+
+    Args:
+        sources (list): Directories (searched recursively with `pattern`), glob
+                        patterns, plain files, or `.jsonl` manifests whose entries
+                        carry `code` or `path` and optionally `output`,
+                        `with_background` and `lexer`. Relative manifest paths
+                        and outputs resolve against the manifest's directory.
+        output_dir (str): Directory receiving `<name>.<fmt>` for every job without
+                          an explicit `output`. An explicit `output` is encoded
+                          in the format of its extension.
+
+    Raises:
+        ValueError: On a bad manifest or format, or when two jobs would write
+                    the same output file.
+        with_background (bool): Default background flag for every job.
+        pattern (str): Glob used inside directories.
+        lexer (str, optional): Pygments lexer name for every job. Guessed from
+                               the file name (falling back to python) when omitted.
+        fmt (str): Output format for every job; see encoder_options for `options`.
+    """
+    encoder_options(fmt, **options)  # fail early on bad settings, not in every worker
+    jobs = []
+
+    def add(path=None, code=None, output=None, background=with_background, name=None, job_lexer=lexer):
+        if job_lexer is None:
+            job_lexer = _guess_lexer_name(path)
+        job_fmt = fmt
+        if output is None:
+            output = os.path.join(output_dir, os.path.splitext(name)[0] + "." + fmt)
+        elif os.path.splitext(output)[1]:
+            # An explicit output is encoded as its extension says, like save_image does.
+            job_fmt = os.path.splitext(output)[1].lstrip(".").lower()
+            if job_fmt not in IMAGE_FORMATS:
+                raise ValueError(f"{output}: unsupported output format {job_fmt!r}, "
+                                 f"expected one of {sorted(IMAGE_FORMATS)}")
+        jobs.append({
+            "label": path or name,
+            "path": path,
+            "code": code,
+            "output": output,
+            "with_background": background,
+            "lexer": job_lexer,
+            "encoder": dict(fmt=job_fmt, **options),
+        })
+
+    for source in sources:
+        if source.endswith(".jsonl"):
+            manifest_dir = os.path.dirname(source)
+            for index, entry in enumerate(_iter_manifest(source)):
+                # Relative paths and outputs are both relative to the manifest, not the cwd.
+                path = entry.get("path")
+                if path is not None:
+                    path = os.path.join(manifest_dir, path)
+                output = entry.get("output")
+                if output is not None:
+                    output = os.path.join(manifest_dir, output)
+                add(path=path, code=entry.get("code"), output=output,
+                    background=entry.get("with_background", with_background), job_lexer=entry.get("lexer", lexer),
+                    name=os.path.basename(path) if path else f"snippet_{index:05d}")
+        elif os.path.isdir(source):
+            for path in sorted(glob.glob(os.path.join(source, "**", pattern), recursive=True)):
+                add(path=path, name=os.path.relpath(path, source))
+        else:
+            paths = sorted(glob.glob(source)) if any(c in source for c in "*?[") else [source]
+            for path in paths:
+                add(path=path, name=os.path.basename(path))
+
+    # Same-named inputs from different directories or manifests would silently overwrite each other.
+    outputs = {}
+    for job in jobs:
+        key = os.path.normcase(os.path.abspath(job["output"]))
+        if key in outputs:
+            raise ValueError(f"{outputs[key]} and {job['label']} both render to {job['output']}; "
+                             "give one of them an explicit output in a manifest")
+        outputs[key] = job["label"]
+    return jobs
+
+
+def render_batch(jobs, workers=None, cache=None):
+    """
+    Renders jobs on a process pool, printing progress and per-file timing.
+
+    Args:
+        jobs (list): Jobs as returned by collect_batch_jobs.
+        workers (int, optional): Worker processes; defaults to the CPU count.
+                                 1 renders in-process, which is handy for debugging.
+        cache (SlideCache, optional): On-disk cache shared by the workers. Its
+                                      stats are updated and it is trimmed to its
+                                      size bound once the batch is done.
+
+    Returns:
+        list: (job, error message) for every job that failed.
+    """
+    for job in jobs:
+        os.makedirs(os.path.dirname(job["output"]) or ".", exist_ok=True)
+
+    total = len(jobs)
+    render_seconds = 0.0
+    start = time.perf_counter()
+
+    cache_dir = cache.cache_dir if cache is not None else None
+    if workers == 1:
+        _init_batch_worker(cache_dir)
+        results = map(_render_batch_job, jobs)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker, initargs=(cache_dir,))
+        results = (future.result() for future in as_completed([executor.submit(_render_batch_job, job) for job in jobs]))
+
+    failures = []
+    try:
+        for done, (job, seconds, hit, error) in enumerate(results, start=1):
+            render_seconds += seconds
+            if error is not None:
+                failures.append((job, error))
+                print(f"[{done}/{total}] {job['label']} -> {job['output']} FAILED: {error}")
+                continue
+            if cache is not None:
+                cache.record(hit, os.path.getsize(job["output"]) if hit else 0)
+            status = " cached" if hit else ""
+            print(f"[{done}/{total}] {job['label']} -> {job['output']} ({seconds * 1000:.0f} ms{status})")
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    elapsed = time.perf_counter() - start
+    rate = total / elapsed if elapsed else 0.0
+    rendered = total - len(failures)
+    print(f"Rendered {rendered} slides in {elapsed:.2f}s ({rate:.1f} slides/s, {render_seconds:.2f}s total render time)")
+    if failures:
+        print(f"{len(failures)} of {total} slides failed:")
+        for job, error in failures:
+            print(f"  {job['output']}: {error}")
+    if cache is not None:
+        cache.evict()
+        print(cache.report())
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render code snippets into terminal-style slides.")
+    parser.add_argument("sources", nargs="*",
+                        help="Directories, glob patterns, files or .jsonl manifests. Renders the built-in examples when omitted.")
+    parser.add_argument("-o", "--output-dir", default="slides", help="Output directory (default: slides)")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--pattern", default="*.py", help="Glob used inside directories (default: *.py)")
+    parser.add_argument("--background", action="store_true", help="Render slides on the gradient background")
+    parser.add_argument("--lexer", default=None, help="Pygments lexer name (default: guessed from each file name)")
+    parser.add_argument("--format", choices=sorted(IMAGE_FORMATS), default="png", help="Output format (default: png)")
+    parser.add_argument("--compress-level", type=int, default=None,
+                        help="PNG zlib level 0-9 (default: Pillow's 6; 1 is much faster)")
+    parser.add_argument("--quality", type=int, default=None, help="JPEG / lossy WebP quality")
+    parser.add_argument("--lossy", action="store_true", help="Encode WebP lossy instead of lossless")
+    parser.add_argument("--cache-dir", default=None, help="Serve unchanged slides from this content-addressed cache")
+    parser.add_argument("--cache-max-mb", type=float, default=None, help="Size bound for --cache-dir in MB (default: unbounded)")
+    args = parser.parse_args(argv)
+    # Checked on the Pillow format, so aliases ("jpg") cannot slip past; the file extension stays as given.
+    pil_format = IMAGE_FORMATS[args.format]
+    if pil_format == "JPEG" and not args.background:
+        parser.error(f"--format {args.format} needs --background, terminal-only slides have transparent corners")
+
+    if not args.sources:
+        # Generate with background (default)
+        generate_code_slide(code_example, output_path="code_slide_with_bg.png", with_background=True)
+
+        # Generate without background (terminal only)
+        generate_code_slide(code_example, output_path="code_slide_terminal_only.png", with_background=False)
+        return
+
+    try:
+        jobs = collect_batch_jobs(args.sources, args.output_dir, with_background=args.background,
+                                  pattern=args.pattern, lexer=args.lexer, fmt=args.format,
+                                  compress_level=args.compress_level, quality=args.quality,
+                                  lossless=False if args.lossy else None)
+    except ValueError as e:
+        parser.error(str(e))
+    cache = None
+    if args.cache_dir:
+        max_bytes = int(args.cache_max_mb * 1e6) if args.cache_max_mb is not None else None
+        cache = SlideCache(args.cache_dir, max_bytes=max_bytes)
+    if render_batch(jobs, workers=args.workers, cache=cache):
+        sys.exit(1)
+
+
 # --- Example Usage ---
 code_example = """@dataclass
 class Item:
@@ -197,8 +909,5 @@ class Item:
     price: float
 """
 
-# Generate with background (default)
-generate_code_slide(code_example, output_path="code_slide_with_bg.png", with_background=True)
-
-# Generate without background (terminal only)
-generate_code_slide(code_example, output_path="code_slide_terminal_only.png", with_background=False)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+Benchmarks the slide rendering pipeline of generate_slide.py stage by stage.
+
+Every corpus case runs in its own worker process, so peak RSS is per case.
+Results are printed as a table and can be written as JSON and compared
+against a previous run to catch regressions between commits:
+
+    python slide_benchmark.py --json before.json
+    python slide_benchmark.py --json after.json --compare before.json --fail-above 1.10
+"""
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import cProfile
+import dataclasses
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import PIL
+from PIL import ImageDraw
+import pygments
+
+import generate_slide
+
+# highlight: lexing, layout and drawing the glyphs; chrome: the terminal window;
+# gradient: the background; composite: pasting the terminal onto it; encode: the image file.
+STAGES = ("highlight", "chrome", "gradient", "composite", "encode")
+
+
+def _python_line(i):
+    return f"    result_{i} = compute(values[{i}], scale={i % 7}) + offset  # step {i}"
+
+
+def build_corpus():
+    """Returns the benchmark snippets: {name: (code, with_background)}."""
+    short = generate_slide.code_example
+    long = "def pipeline(values, offset):\n" + "\n".join(_python_line(i) for i in range(199))
+    wide = "\n".join(
+        f"row_{i} = [" + ", ".join(f"'cell_{i}_{j}'" for j in range(24)) + "]" for i in range(20)
+    )
+    return {
+        "short": (short, False),
+        "short_background": (short, True),
+        "200_lines": (long, False),
+        "wide_lines": (wide, False),
+    }
+
+
+def _clear_caches():
+    generate_slide._cached_gradient.cache_clear()
+    generate_slide._cached_terminal_chrome.cache_clear()
+    generate_slide._corner_sprite.cache_clear()
+    generate_slide._button_sprite.cache_clear()
+
+
+def _run_stages(renderer, code, with_background, fmt):
+    """Renders code once, timing every pipeline stage. Returns (stage seconds, encoded bytes, size)."""
+    timings = dict.fromkeys(STAGES, 0.0)
+
+    start = time.perf_counter()
+    runs, code_size = renderer.layout(code)
+    timings["highlight"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    image = renderer.chrome(renderer.terminal_size(code_size))
+    timings["chrome"] = time.perf_counter() - start
+
+    if with_background:
+        start = time.perf_counter()
+        background = renderer.background()
+        timings["gradient"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    generate_slide.draw_code_runs(ImageDraw.Draw(image), runs, offset=renderer.code_offset())
+    timings["highlight"] += time.perf_counter() - start
+
+    start = time.perf_counter()
+    if with_background:
+        background.paste(image, renderer.terminal_position(image.size), mask=image)
+        image = background
+    timings["composite"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    data = generate_slide.encode_image(image, fmt)
+    timings["encode"] = time.perf_counter() - start
+    return timings, len(data), image.size
+
+
+def run_case(name, code, with_background, theme, iterations=5, fmt="png", warm=False, profile_dir=None):
+    """
+    Benchmarks one corpus case in the current process.
+
+    Caches (gradient, chrome, sprites) are cleared before every iteration
+    unless warm is set, so by default every stage does its full work. The
+    timed iterations run without tracing; tracemalloc and cProfile get passes
+    of their own afterwards, so their overhead stays out of the timings.
+    """
+    renderer = generate_slide.SlideRenderer(theme)
+    walls, stages = [], {stage: [] for stage in STAGES}
+
+    for _ in range(iterations):
+        if not warm:
+            _clear_caches()
+        start = time.perf_counter()
+        timings, output_bytes, size = _run_stages(renderer, code, with_background, fmt)
+        walls.append(time.perf_counter() - start)
+        for stage, seconds in timings.items():
+            stages[stage].append(seconds)
+    # ru_maxrss is KiB on Linux and bytes on macOS; read before tracemalloc adds its own bookkeeping
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 ** 2 if sys.platform == "darwin" else 1024)
+
+    if not warm:
+        _clear_caches()
+    tracemalloc.start()
+    _run_stages(renderer, code, with_background, fmt)
+    _, tracemalloc_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    if profile_dir:
+        profiler = cProfile.Profile()
+        for _ in range(iterations):
+            if not warm:
+                _clear_caches()
+            profiler.runcall(_run_stages, renderer, code, with_background, fmt)
+        os.makedirs(profile_dir, exist_ok=True)
+        profiler.dump_stats(os.path.join(profile_dir, f"{name}.prof"))
+
+    return {
+        "lines": code.count("\n") + 1,
+        "with_background": with_background,
+        "size": list(size),
+        "output_bytes": output_bytes,
+        "wall_ms": {
+            "min": min(walls) * 1000,
+            "median": statistics.median(walls) * 1000,
+            "mean": statistics.fmean(walls) * 1000,
+        },
+        "stages_ms": {stage: statistics.median(values) * 1000 for stage, values in stages.items()},
+        "peak_rss_mb": peak_rss,
+        "tracemalloc_peak_mb": tracemalloc_peak / 1e6,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(cases=None, theme=None, iterations=5, fmt="png", warm=False, profile_dir=None):
+    """Runs the corpus (or the named cases), one fresh worker process per case."""
+    corpus = build_corpus()
+    names = cases or list(corpus)
+    theme = theme or generate_slide.Theme()
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    for name in names:
+        code, with_background = corpus[name]
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            results[name] = executor.submit(run_case, name, code, with_background, theme, iterations,
+                                            fmt, warm, profile_dir).result()
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pillow": PIL.__version__,
+            "pygments": pygments.__version__,
+            "iterations": iterations,
+            "format": fmt,
+            "warm": warm,
+            "theme": dataclasses.asdict(theme),
+        },
+        "cases": results,
+    }
+
+
+def format_report(report, baseline=None):
+    """Renders a benchmark report (and its ratio to a baseline) as a text table."""
+    header = f"{'case':<18}{'wall ms':>10}" + "".join(f"{stage:>11}" for stage in STAGES) + f"{'rss MB':>9}"
+    if baseline:
+        header += f"{'vs base':>10}"
+    lines = [header, "-" * len(header)]
+    for name, case in report["cases"].items():
+        line = f"{name:<18}{case['wall_ms']['median']:>10.1f}"
+        line += "".join(f"{case['stages_ms'][stage]:>11.1f}" for stage in STAGES)
+        line += f"{case['peak_rss_mb']:>9.0f}"
+        base = baseline["cases"].get(name) if baseline else None
+        if base:
+            line += f"{case['wall_ms']['median'] / base['wall_ms']['median']:>9.2f}x"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def regressions(report, baseline, threshold):
+    """Names of cases whose median wall time grew by more than threshold (e.g. 1.10) over baseline."""
+    slower = []
+    for name, case in report["cases"].items():
+        base = baseline["cases"].get(name)
+        if base and case["wall_ms"]["median"] > base["wall_ms"]["median"] * threshold:
+            slower.append(name)
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the code slide rendering pipeline.")
+    parser.add_argument("--case", action="append", choices=sorted(build_corpus()),
+                        help="Only run this corpus case (repeatable)")
+    parser.add_argument("-n", "--iterations", type=int, default=5, help="Iterations per case (default: 5)")
+    parser.add_argument("--format", choices=["png", "webp"], default="png", help="Encoder to benchmark (default: png)")
+    parser.add_argument("--font", default=None, help="Font name or path overriding the theme font")
+    parser.add_argument("--warm", action="store_true", help="Keep gradient/chrome caches warm between iterations")
+    parser.add_argument("--json", default=None, help="Write the report as JSON to this path")
+    parser.add_argument("--compare", default=None, help="Baseline JSON report to compare against")
+    parser.add_argument("--fail-above", type=float, default=None,
+                        help="With --compare, exit 1 when a case's median wall time exceeds baseline x this factor")
+    parser.add_argument("--profile-dir", default=None, help="Dump a cProfile .prof file per case into this directory")
+    args = parser.parse_args(argv)
+
+    theme = generate_slide.Theme()
+    if args.font:
+        theme = dataclasses.replace(theme, font_family=args.font)
+
+    report = run_benchmark(args.case, theme=theme, iterations=args.iterations, fmt=args.format,
+                           warm=args.warm, profile_dir=args.profile_dir)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print(format_report(report, baseline))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if baseline and args.fail_above:
+        slower = regressions(report, baseline, args.fail_above)
+        if slower:
+            print(f"Regressed beyond {args.fail_above:.2f}x: {', '.join(slower)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+# Bump when rendering changes in a way that should invalidate every cached slide.
+CACHE_VERSION = 1
+
+
+def content_key(*parts):
+    """Hashes JSON-serializable parts into a hex key for SlideCache."""
+    payload = json.dumps([CACHE_VERSION, *parts], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _replace_atomically(output_path, write):
+    """Calls write(tmp_path) next to output_path and moves the result into place."""
+    directory = os.path.dirname(output_path) or "."
+    suffix = os.path.splitext(output_path)[1]
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=suffix, dir=directory)
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class SlideCache:
+    """
+    Content-addressed on-disk cache of rendered slides.
+
+    Entries are stored as `<cache_dir>/<key[:2]>/<key><ext>`. Hits are served by
+    hardlinking (or copying, when linking is not possible or disabled) the entry
+    to the output path. Entries are touched on every hit, and once the cache
+    grows beyond max_bytes the least recently used ones are evicted.
+
+    Args:
+        cache_dir (str): Directory holding the cache, created if missing.
+        max_bytes (int, optional): Size bound for the cache. Unbounded when None.
+        link (bool, optional): Serve hits by hardlink instead of copy. Defaults to True.
+    """
+
+    def __init__(self, cache_dir, max_bytes=None, link=True):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.link = link
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.evictions = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._size = None
+
+    def entry_path(self, key, ext):
+        return os.path.join(self.cache_dir, key[:2], key + ext)
+
+    def fetch(self, key, output_path):
+        """Materializes the entry for key at output_path. Returns False on a miss."""
+        entry = self.entry_path(key, os.path.splitext(output_path)[1])
+        try:
+            size = os.path.getsize(entry)
+        except FileNotFoundError:
+            self.misses += 1
+            return False
+
+        _replace_atomically(output_path, lambda tmp_path: self._materialize(entry, tmp_path))
+        try:
+            os.utime(entry)
+        except FileNotFoundError:
+            pass  # evicted concurrently; the output is already in place
+        self.hits += 1
+        self.bytes_saved += size
+        return True
+
+    def _materialize(self, entry, tmp_path):
+        if self.link:
+            os.remove(tmp_path)
+            try:
+                os.link(entry, tmp_path)
+                return
+            except OSError:
+                pass  # cross-device or unsupported, fall back to a copy
+        shutil.copyfile(entry, tmp_path)
+
+    def store(self, key, output_path):
+        """Copies a freshly rendered output_path into the cache under key."""
+        entry = self.entry_path(key, os.path.splitext(output_path)[1])
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        _replace_atomically(entry, lambda tmp_path: shutil.copyfile(output_path, tmp_path))
+        if self.max_bytes is not None:
+            if self._size is None:
+                self._size = self.total_bytes()
+            else:
+                self._size += os.path.getsize(entry)
+            if self._size > self.max_bytes:
+                self.evict()
+
+    def get_or_render(self, key, output_path, render):
+        """
+        Serves output_path from the cache, or calls render(path) to produce it.
+
+        render always writes to a fresh temporary file that then replaces
+        output_path, so an output that is a hardlink to a cache entry is never
+        overwritten in place.
+
+        Returns:
+            bool: True on a cache hit.
+        """
+        if self.fetch(key, output_path):
+            return True
+        _replace_atomically(output_path, render)
+        self.store(key, output_path)
+        return False
+
+    def _entries(self):
+        for directory, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.startswith(".tmp-"):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield stat.st_mtime, stat.st_size, path
+
+    def total_bytes(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self, max_bytes=None):
+        """Removes least recently used entries until the cache fits in max_bytes."""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if max_bytes is None or total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.evictions += 1
+        self._size = total
+        return total
+
+    def record(self, hit, bytes_saved=0):
+        """Counts a lookup made by another SlideCache on the same directory (e.g. a worker process)."""
+        if hit:
+            self.hits += 1
+            self.bytes_saved += bytes_saved
+        else:
+            self.misses += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "bytes_saved": self.bytes_saved,
+            "evictions": self.evictions,
+        }
+
+    def report(self):
+        stats = self.stats()
+        return (f"Cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%} hit rate), "
+                f"{stats['bytes_saved'] / 1e6:.1f} MB served from cache, {stats['evictions']} evicted")
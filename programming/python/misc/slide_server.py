@@ -0,0 +1,403 @@
+"""
+Long-running local render service for generate_slide.py.
+
+Keeps warm SlideRenderers (fonts, lexers, chrome and gradient caches) in a
+bounded pool of worker processes, so docs tooling pays one HTTP round trip
+per slide instead of a Python start-up plus font loading.
+
+    python slide_server.py --port 8765 --workers 4
+
+    POST /render   {"code": "...", "lexer": "python", "background": false,
+                    "format": "png", "compress_level": 1, "theme": {"font_size": 40}}
+                   -> the encoded image
+    GET  /metrics  -> latency percentiles, admission and cache counters (JSON)
+    GET  /healthz  -> "ok"
+"""
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+import argparse
+import asyncio
+import dataclasses
+import json
+import math
+import os
+import time
+
+from PIL import ImageColor
+
+import generate_slide
+from slide_cache import content_key
+
+LOCAL_HOSTS = ("127.0.0.1", "::1", "localhost")
+CONTENT_TYPES = {"PNG": "image/png", "WEBP": "image/webp", "JPEG": "image/jpeg"}
+MAX_BODY_BYTES = 1 << 20
+LATENCY_WINDOW = 10000
+ENCODER_FIELDS = {"compress_level": int, "quality": int, "lossless": bool}
+
+
+class RequestError(Exception):
+    """Raised for requests that get an error response instead of an image."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+_TYPE_NAMES = {bool: "a boolean", int: "an integer", float: "a number", str: "a string", tuple: "a list"}
+
+
+def convert_field(name, value, kind):
+    """
+    Converts a JSON value to kind (bool, int, float, str or tuple), so that a
+    wrongly typed field is a 400 naming it rather than an error deep in a render.
+    Numbers may be given as numeric strings; lists become tuples of their
+    items (see convert_theme_field for element checks).
+    """
+    if kind is bool and isinstance(value, bool):
+        return value
+    if kind is str and isinstance(value, str):
+        return value
+    if kind is tuple and isinstance(value, list):
+        return tuple(value)
+    if kind in (int, float) and not isinstance(value, bool):
+        try:
+            number = float(value) if isinstance(value, (int, float, str)) else None
+        except ValueError:
+            number = None
+        if number is not None and not math.isfinite(number):
+            number = None
+        if number is not None and kind is float:
+            return number
+        if number is not None and number.is_integer():
+            return int(number)
+    raise RequestError(HTTPStatus.BAD_REQUEST, f"'{name}' must be {_TYPE_NAMES[kind]}, got {json.dumps(value)}")
+
+
+def convert_color(name, value):
+    """Checks a color given as a PIL color string or an [r, g, b(, a)] list of 0-255 integers."""
+    if isinstance(value, str):
+        try:
+            ImageColor.getrgb(value)
+            return value
+        except ValueError:
+            pass
+    elif isinstance(value, list) and len(value) in (3, 4):
+        channels = tuple(convert_field(f"{name}[{i}]", channel, int) for i, channel in enumerate(value))
+        if all(0 <= channel <= 255 for channel in channels):
+            return channels
+    raise RequestError(HTTPStatus.BAD_REQUEST,
+                       f"'{name}' must be a color name, '#rrggbb' or an [r, g, b] list, got {json.dumps(value)}")
+
+
+def convert_theme_field(name, value, kind):
+    """convert_field for a Theme field, also checking the items of the tuple-valued ones."""
+    value = convert_field(f"theme.{name}", value, kind)
+    if name == "background_size":
+        if len(value) != 2:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "'theme.background_size' must be [width, height]")
+        size = tuple(convert_field(f"theme.background_size[{i}]", item, int) for i, item in enumerate(value))
+        if min(size) < 1:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "'theme.background_size' must be positive")
+        return size
+    if name in ("gradient_colors", "terminal_button_colors"):
+        if not value:
+            raise RequestError(HTTPStatus.BAD_REQUEST, f"'theme.{name}' needs at least one color")
+        return tuple(convert_color(f"theme.{name}[{i}]", item) for i, item in enumerate(value))
+    return value
+
+
+def parse_theme(overrides):
+    """Builds a Theme from JSON overrides, converting each to the type of its Theme field."""
+    if not overrides:
+        return None
+    if not isinstance(overrides, dict):
+        raise RequestError(HTTPStatus.BAD_REQUEST, "'theme' must be an object")
+    fields = {field.name: field.type for field in dataclasses.fields(generate_slide.Theme)}
+    unknown = sorted(set(overrides) - set(fields))
+    if unknown:
+        raise RequestError(HTTPStatus.BAD_REQUEST, f"Unknown theme fields: {', '.join(unknown)}")
+    return dataclasses.replace(generate_slide.Theme(), **{
+        name: convert_theme_field(name, value, fields[name]) for name, value in overrides.items()
+    })
+
+
+def _render_in_worker(theme, code, lexer, with_background, fmt, options):
+    """Runs in a pool worker: renders with the worker's warm renderer for theme."""
+    renderer = generate_slide.get_renderer(theme)
+    data = renderer.render_bytes(code, fmt, with_background=with_background, lexer=lexer, **options)
+    caches = {
+        "renderers": generate_slide.get_renderer.cache_info()._asdict(),
+        "chrome": generate_slide._cached_terminal_chrome.cache_info()._asdict(),
+        "gradient": generate_slide._cached_gradient.cache_info()._asdict(),
+    }
+    return data, os.getpid(), caches
+
+
+def _init_worker():
+    generate_slide.get_renderer()
+
+
+class ByteLRU:
+    """In-memory LRU of encoded slides, bounded by total bytes."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        data = self.entries.get(key)
+        if data is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return data
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        if key in self.entries:
+            self.size -= len(self.entries.pop(key))
+        self.entries[key] = data
+        self.size += len(data)
+        while self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self.entries), "bytes": self.size}
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(int(fraction * len(sorted_values)), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+class SlideServer:
+    """
+    Asyncio HTTP front end over a pool of warm renderer processes.
+
+    Admission control: at most `concurrency` renders run at once and at most
+    `max_queue` more wait for a slot; anything beyond that gets 503 with a
+    Retry-After header instead of piling up.
+    """
+
+    def __init__(self, workers=None, concurrency=None, max_queue=64, cache_bytes=64 * 10**6):
+        workers = workers or os.cpu_count() or 1
+        self.executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+        self.concurrency = concurrency or workers
+        self.max_queue = max_queue
+        self.slots = asyncio.Semaphore(self.concurrency)
+        self.cache = ByteLRU(cache_bytes) if cache_bytes else None
+        self.pending = 0
+        self.counters = {"requests": 0, "rendered": 0, "rejected": 0, "errors": 0}
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.worker_caches = {}
+        self.started = time.time()
+
+    async def render(self, request):
+        code = request.get("code")
+        if not isinstance(code, str):
+            raise RequestError(HTTPStatus.BAD_REQUEST, "'code' must be a string")
+        theme = parse_theme(request.get("theme"))
+        lexer = convert_field("lexer", request.get("lexer", "python"), str)
+        with_background = convert_field("background", request.get("background", False), bool)
+        fmt = convert_field("format", request.get("format", "png"), str)
+        options = {name: convert_field(name, request[name], kind) for name, kind in ENCODER_FIELDS.items()
+                   if request.get(name) is not None}
+        try:
+            pil_format, save_options = generate_slide.encoder_options(fmt, **options)
+        except ValueError as e:
+            raise RequestError(HTTPStatus.BAD_REQUEST, str(e))
+
+        key = content_key(dataclasses.asdict(theme or generate_slide.Theme()), code, lexer, with_background,
+                          [pil_format, save_options])
+        data = self.cache.get(key) if self.cache else None
+        if data is not None:
+            return data, CONTENT_TYPES[pil_format]
+
+        if self.pending >= self.concurrency + self.max_queue:
+            self.counters["rejected"] += 1
+            raise RequestError(HTTPStatus.SERVICE_UNAVAILABLE, "Render queue is full, retry later")
+        self.pending += 1
+        try:
+            async with self.slots:
+                loop = asyncio.get_running_loop()
+                data, pid, caches = await loop.run_in_executor(
+                    self.executor, _render_in_worker, theme, code, lexer, with_background, fmt, options)
+        except ValueError as e:
+            # unknown lexer, JPEG without background, ...
+            raise RequestError(HTTPStatus.BAD_REQUEST, str(e))
+        finally:
+            self.pending -= 1
+        self.worker_caches[pid] = caches
+        self.counters["rendered"] += 1
+        if self.cache:
+            self.cache.put(key, data)
+        return data, CONTENT_TYPES[pil_format]
+
+    def metrics(self):
+        latencies = sorted(self.latencies)
+        worker_totals = {}
+        for caches in self.worker_caches.values():
+            for name, info in caches.items():
+                totals = worker_totals.setdefault(name, {"hits": 0, "misses": 0})
+                totals["hits"] += info["hits"]
+                totals["misses"] += info["misses"]
+        for totals in worker_totals.values():
+            lookups = totals["hits"] + totals["misses"]
+            totals["hit_rate"] = totals["hits"] / lookups if lookups else 0.0
+        return {
+            "uptime_s": time.time() - self.started,
+            **self.counters,
+            "in_flight": min(self.pending, self.concurrency),
+            "queued": max(self.pending - self.concurrency, 0),
+            "concurrency": self.concurrency,
+            "max_queue": self.max_queue,
+            "latency_ms": {
+                "count": len(latencies),
+                "p50": _percentile(latencies, 0.50),
+                "p90": _percentile(latencies, 0.90),
+                "p99": _percentile(latencies, 0.99),
+                "max": latencies[-1] if latencies else None,
+            },
+            "response_cache": self.cache.stats() if self.cache else None,
+            "worker_caches": worker_totals,
+        }
+
+    async def dispatch(self, method, path, body):
+        """Returns (status, content type, body bytes) for one request."""
+        if path == "/healthz" and method == "GET":
+            return HTTPStatus.OK, "text/plain", b"ok"
+        if path == "/metrics" and method == "GET":
+            return HTTPStatus.OK, "application/json", json.dumps(self.metrics(), indent=2).encode()
+        if path == "/render" and method == "POST":
+            self.counters["requests"] += 1
+            start = time.perf_counter()
+            try:
+                request = json.loads(body)
+            except ValueError:
+                raise RequestError(HTTPStatus.BAD_REQUEST, "Body must be JSON")
+            if not isinstance(request, dict):
+                raise RequestError(HTTPStatus.BAD_REQUEST, "Body must be a JSON object")
+            data, content_type = await self.render(request)
+            self.latencies.append((time.perf_counter() - start) * 1000)
+            return HTTPStatus.OK, content_type, data
+        if path in ("/healthz", "/metrics", "/render"):
+            raise RequestError(HTTPStatus.METHOD_NOT_ALLOWED, f"{method} not allowed on {path}")
+        raise RequestError(HTTPStatus.NOT_FOUND, f"No route for {path}")
+
+    async def handle_connection(self, reader, writer):
+        """Serves HTTP/1.1 requests on one connection, keeping it alive between requests."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, _ = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self._respond(writer, HTTPStatus.BAD_REQUEST, "text/plain", b"Malformed request line")
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = headers.get("connection", "").lower() != "close"
+
+                length = headers.get("content-length", "") or "0"
+                if not length.isdigit():
+                    # Without a valid length the body cannot be framed, so the connection cannot be reused.
+                    await self._respond(writer, HTTPStatus.BAD_REQUEST, "text/plain",
+                                        b"Invalid Content-Length", keep_alive=False)
+                    break
+                length = int(length)
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "text/plain",
+                                        b"Request body too large", keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                extra_headers = {}
+                try:
+                    status, content_type, payload = await self.dispatch(method, target.split("?", 1)[0], body)
+                except RequestError as e:
+                    if e.status >= 500:
+                        extra_headers["Retry-After"] = "1"
+                    else:
+                        self.counters["errors"] += 1
+                    status, content_type = e.status, "application/json"
+                    payload = json.dumps({"error": str(e)}).encode()
+                except Exception as e:
+                    self.counters["errors"] += 1
+                    status, content_type = HTTPStatus.INTERNAL_SERVER_ERROR, "application/json"
+                    payload = json.dumps({"error": f"{type(e).__name__}: {e}"}).encode()
+                await self._respond(writer, status, content_type, payload, keep_alive, extra_headers)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, content_type, payload, keep_alive=True, extra_headers=None):
+        headers = {
+            "Content-Type": content_type,
+            "Content-Length": str(len(payload)),
+            "Connection": "keep-alive" if keep_alive else "close",
+            **(extra_headers or {}),
+        }
+        head = f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        head += "".join(f"{name}: {value}\r\n" for name, value in headers.items()) + "\r\n"
+        writer.write(head.encode("latin-1") + bytes(payload))
+        await writer.drain()
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+
+
+async def serve(host="127.0.0.1", port=8765, **server_options):
+    """Runs the render service until cancelled. Only loopback hosts are accepted."""
+    if host not in LOCAL_HOSTS:
+        raise ValueError(f"Refusing to listen on {host!r}; the render service is localhost only")
+    slide_server = SlideServer(**server_options)
+    server = await asyncio.start_server(slide_server.handle_connection, host, port)
+    print(f"Serving slides on http://{host}:{port} ({slide_server.concurrency} concurrent renders)")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        slide_server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve code slide renders over HTTP on localhost.")
+    parser.add_argument("--host", default="127.0.0.1", choices=LOCAL_HOSTS, help="Loopback address (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="Port (default: 8765)")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="Renderer processes (default: CPU count)")
+    parser.add_argument("--concurrency", type=int, default=None, help="Renders in flight at once (default: workers)")
+    parser.add_argument("--max-queue", type=int, default=64, help="Requests allowed to wait for a slot before 503 (default: 64)")
+    parser.add_argument("--cache-mb", type=float, default=64, help="In-memory response cache size, 0 disables (default: 64)")
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(serve(args.host, args.port, workers=args.workers, concurrency=args.concurrency,
+                          max_queue=args.max_queue, cache_bytes=int(args.cache_mb * 1e6)))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()